@@ -1,62 +1,410 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, g, Response
 from flask_cors import CORS
-import whisper
-import tempfile
 import os
-import librosa
-import numpy as np
-import sounddevice as sd
-import scipy.io.wavfile as wav
 import warnings
-import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
 from datetime import datetime
 
+from config import config
+from model_registry import ModelRegistry, MockWhisperModel
+from inference import InferencePool, QueueFullError
+from batching import MicroBatcher
+from recording import RecordingManager, SessionLimitError, SessionNotFoundError
+from streaming import StreamManager, pcm_chunk_to_float32
+from vad import trim_silence
+from chunking import transcribe_long
+from cache import TranscriptionCache, digest_cache_key
+from coalescing import RequestCoalescer
+from jobs import JobManager, OverloadedError
+from audio_io import AudioDecodeError, AudioTooLongError, duration_seconds, SAMPLE_RATE
+from uploads import UploadError, UploadTooLargeError, receive_audio_upload, receive_audio_uploads
+from metrics import Metrics, process_rss_bytes
+from languages import LanguageMemory, normalize_language
+from decoding import is_batchable, profile_options
+from batch_upload import stream_batch
+from cpu_partition import parse_layout, pin_current_process, resolve_layout
+from scheduling import DEFAULT_PRIORITY, normalize_priority
+
 # Suppress warnings for cleaner output
 warnings.filterwarnings("ignore")
 os.environ['TF_CPP_MIN_LOG_LEVEL'] = '3'
 os.environ['NUMBA_DISABLE_JIT'] = '1'
 
 app = Flask(__name__)
+app.config.from_object(config[os.environ.get('FLASK_ENV', 'default')])
 # Enable CORS with specific origins and headers
 CORS(app, origins=['http://localhost:3000', 'http://127.0.0.1:3000', 'http://localhost:3001', 'http://127.0.0.1:3001'], 
      methods=['GET', 'POST', 'OPTIONS'], 
      allow_headers=['Content-Type', 'Authorization'])
 
-# Global variables for recording
-recording = []
-is_recording = False
-stream = None
-
-# Load Whisper model (with fallback)
-model = None
-try:
-    print("Loading Whisper model...")
-    model = whisper.load_model("small")
-    print("Whisper model loaded successfully!")
-except Exception as e:
-    print(f"Failed to load Whisper model: {e}")
-    print("Using mock model for testing...")
+# Whisper models are loaded lazily by name and evicted under a memory budget
+registry = ModelRegistry(
+    default_model=app.config['WHISPER_MODEL'],
+    allowed_models=app.config['WHISPER_MODELS'],
+    memory_budget_mb=app.config['MODEL_MEMORY_BUDGET_MB'],
+    default_precision=app.config['WHISPER_PRECISION'],
+    fake_rtf=app.config['FAKE_ENGINE_RTF'],
+    fake_overhead_seconds=app.config['FAKE_ENGINE_OVERHEAD_MS'] / 1000.0
+)
+
+# Per-stage latency histograms and service gauges, scraped from /metrics
+metrics = Metrics()
+
+def resolve_cpu_sets():
+    """One CPU set per model replica from CPU_LAYOUT, calibrating (or reusing a calibration) for 'auto'"""
+    return resolve_layout(
+        app.config['CPU_LAYOUT'], registry, app.config['CPU_CALIBRATION_CLIPS'],
+        calibration_file=app.config['CPU_CALIBRATION_FILE'] or None,
+        max_replicas=app.config['CPU_MAX_REPLICAS'],
+        options=profile_options(app.config['DECODING_PROFILE']),
+        interop_threads=app.config['CPU_INTEROP_THREADS']
+    )
+
+# Transcription runs on dedicated inference workers, each holding its own
+# model replica; routes submit work to a bounded queue and wait for results.
+# With a CPU layout the replica count and core sets are resolved as the pool
+# starts, so a calibration run does not delay binding the port.
+inference_pool = InferencePool(
+    registry,
+    workers=app.config['INFERENCE_WORKERS'],
+    queue_size=app.config['INFERENCE_QUEUE_SIZE'],
+    torch_threads=app.config['INFERENCE_TORCH_THREADS'],
+    timeout=app.config['INFERENCE_TIMEOUT'],
+    warmup=app.config['MODEL_WARMUP'],
+    metrics=metrics,
+    cpu_sets=resolve_cpu_sets if app.config['INFERENCE_WORKERS'] > 0 and parse_layout(app.config['CPU_LAYOUT']) != 'off' else None,
+    interop_threads=app.config['CPU_INTEROP_THREADS'],
+    scheduler_policy=app.config['SCHEDULER_POLICY'],
+    aging_rate=app.config['SCHEDULER_AGING_RATE'],
+    class_delays={'bulk': app.config['SCHEDULER_BULK_DELAY']},
+    initial_rtf=app.config['JOB_INITIAL_RTF']
+)
+
+def init_services():
+    """Create the services that own threads, file handles or per-process state
+
+    Runs at import and again in every pre-forked server worker: threads and
+    SQLite connections do not survive fork(), so each worker builds its own.
+    """
+    global batcher, transcription_cache, coalescer, jobs, recordings, streams, batch_runners
+    
+    # Requests arriving within a few milliseconds are decoded as one batch
+    batcher = None
+    if app.config['BATCH_MAX_SIZE'] > 1:
+        batcher = MicroBatcher(
+            inference_pool,
+            max_batch_size=app.config['BATCH_MAX_SIZE'],
+            max_wait_ms=app.config['BATCH_MAX_WAIT_MS']
+        )
+    
+    # Transcriptions of identical uploads are served from memory or a SQLite file
+    transcription_cache = None
+    if app.config['CACHE_ENABLED']:
+        transcription_cache = TranscriptionCache(
+            memory_entries=app.config['CACHE_MEMORY_ENTRIES'],
+            disk_path=app.config['CACHE_DISK_PATH'] or None,
+            disk_max_mb=app.config['CACHE_DISK_MAX_MB'],
+            ttl_seconds=app.config['CACHE_TTL_SECONDS']
+        )
     
-    class MockWhisperModel:
-        def transcribe(self, audio):
-            return {
-                "text": "This is a mock transcription. Please install Whisper dependencies for real transcription.",
-                "language": "en"
-            }
+    # Duplicates of a transcription that is still running wait for its result
+    coalescer = RequestCoalescer() if app.config['COALESCE_REQUESTS'] else None
     
-    model = MockWhisperModel()
+    # Asynchronous jobs share the inference workers and shed load they cannot drain in time
+    jobs = JobManager(
+        workers=max(app.config['INFERENCE_WORKERS'], 1),
+        max_queued=app.config['JOB_MAX_QUEUED'],
+        max_drain_seconds=app.config['JOB_MAX_DRAIN_SECONDS'],
+        initial_rtf=app.config['JOB_INITIAL_RTF'],
+        result_ttl=app.config['JOB_RESULT_TTL']
+    )
+    
+    # Each recording gets its own session, buffer and input stream
+    recordings = RecordingManager(
+        samplerate=app.config['AUDIO_SAMPLE_RATE'],
+        channels=app.config['AUDIO_CHANNELS'],
+        max_sessions=app.config['RECORDING_MAX_SESSIONS'],
+        idle_timeout=app.config['RECORDING_IDLE_TIMEOUT'],
+        max_seconds=app.config['RECORDING_MAX_SECONDS']
+    )
+    
+    # Live streams re-transcribe a sliding window of uncommitted audio as chunks arrive
+    streams = StreamManager(
+        inference_pool.submit_transcription,
+        max_streams=app.config['STREAM_MAX_SESSIONS'],
+        idle_timeout=app.config['STREAM_IDLE_TIMEOUT'],
+        step_seconds=app.config['STREAM_STEP_SECONDS'],
+        max_window_seconds=app.config['STREAM_MAX_WINDOW_SECONDS'],
+        timeout=app.config['INFERENCE_TIMEOUT']
+    )
+    
+    # Files of /transcribe-batch uploads run concurrently so the inference workers stay busy
+    batch_runners = ThreadPoolExecutor(
+        max_workers=app.config['BATCH_UPLOAD_CONCURRENCY'],
+        thread_name_prefix='batch-upload'
+    )
+
+def preload_models():
+    """Load the default model in this process before a pre-forking server forks its workers
 
-def audio_callback(indata, frames, time, status):
-    """Callback function for real-time audio capture"""
-    global recording
-    if status:
-        print(f"Audio status: {status}")
+    Forked workers then share the weight pages copy-on-write instead of each
+    loading its own copy. Torch is held to one thread here so no OpenMP pool
+    exists at fork time; each worker sets its own thread count afterwards.
+    """
     try:
-        recording.append(indata.copy())
-        print(f"Captured {frames} frames of audio")
-    except Exception as e:
-        print(f"Error in audio callback: {e}")
+        import torch
+        torch.set_num_threads(1)
+    except ImportError:
+        pass
+    registry.get()
+
+def pin_forked_worker(cpus):
+    """Pin a pre-forked server worker to its CPU set; its inline inference uses exactly those cores"""
+    pin_current_process(cpus, app.config['CPU_INTEROP_THREADS'])
+    inference_pool.torch_threads = len(cpus)
+    print(f"Worker {os.getpid()} pinned to CPUs {cpus}")
+
+def init_forked_worker():
+    """Per-worker setup after fork: fresh services and an inline pool sharing the preloaded model"""
+    init_services()
+    inference_pool.start_in_background()
+
+init_services()
+
+def register_gauges():
+    """Gauges sampled from the live services whenever /metrics is scraped"""
+    pool_status = inference_pool.status
+    metrics.gauge('inference_queue_depth', lambda: pool_status()['queue_depth'],
+                  'Transcriptions waiting for an inference worker')
+    metrics.gauge('inference_queue_depth_by_priority', lambda: [
+        ({'priority': priority}, depth) for priority, depth in pool_status()['scheduler']['queued'].items()
+    ], 'Transcriptions waiting for an inference worker, by priority class')
+    metrics.gauge('inference_in_flight', lambda: pool_status()['in_flight'],
+                  'Transcriptions currently running on inference workers')
+    metrics.gauge('inference_ready', lambda: int(inference_pool.ready),
+                  'Whether every inference worker has loaded and warmed up its model')
+    metrics.gauge('batch_pending', lambda: batcher.status()['pending'] if batcher else 0,
+                  'Clips waiting to be grouped into a batch')
+    metrics.gauge('job_estimated_drain_seconds', lambda: jobs.estimated_drain_seconds(),
+                  'Estimated seconds to finish all queued and running jobs')
+    metrics.gauge('job_real_time_factor', lambda: jobs.rtf,
+                  'Smoothed real-time factor of recent jobs, used for load shedding')
+    metrics.gauge('cache_hit_ratio', lambda: transcription_cache.stats()['hit_rate'] if transcription_cache else None,
+                  'Share of transcription cache lookups answered from memory or disk')
+    metrics.gauge('recording_overrun_frames', lambda: recordings.capture_stats()['overrun_frames'] if recordings else 0,
+                  'Recorded frames overwritten because a session outlasted its ring buffer')
+    metrics.gauge('recording_dropped_blocks', lambda: recordings.capture_stats()['dropped_blocks'] if recordings else 0,
+                  'Audio blocks the input device reported as lost (input overflow)')
+    metrics.gauge('coalesced_in_flight', lambda: coalescer.status()['in_flight'] if coalescer else 0,
+                  'Distinct transcriptions that identical requests can currently join')
+    metrics.gauge('model_load_seconds', lambda: [
+        ({'model': name, 'pid': worker['pid']}, seconds)
+        for worker in list(inference_pool.worker_status.values())
+        for name, seconds in worker.get('load_seconds', {}).items()
+    ], 'Time each inference worker took to load each resident model')
+    metrics.gauge('process_resident_memory_bytes', lambda: [({'process': 'server', 'pid': os.getpid()}, process_rss_bytes())] + [
+        ({'process': 'inference_worker', 'pid': worker['pid']}, worker.get('rss_bytes'))
+        for worker in list(inference_pool.worker_status.values())
+        if worker['pid'] != os.getpid()
+    ], 'Resident memory of the server and its inference workers (workers as of their last task)')
+
+register_gauges()
+
+# Languages detected per client session, so follow-up clips skip detection
+language_memory = LanguageMemory(
+    max_sessions=app.config['LANGUAGE_MEMORY_SESSIONS'],
+    ttl_seconds=app.config['LANGUAGE_MEMORY_TTL']
+)
+
+# Used when real transcription fails so the UI still gets a response
+fallback_model = MockWhisperModel()
+
+def submit_transcription(model_name, audio, options=None, priority=None):
+    """Queue audio on the inference workers, batching with concurrent requests when enabled"""
+    # Only greedy decodes of clips that fit one 30-second Whisper window can be batched
+    if batcher is not None and len(audio) <= 30 * SAMPLE_RATE and is_batchable(options):
+        return batcher.submit(model_name, audio, options, priority)
+    return inference_pool.submit_transcription(model_name, audio, options, priority)
+
+def run_transcription(model_name, audio, options=None, priority=None):
+    """Transcribe audio and wait for the result, splitting long audio into parallel chunks"""
+    if app.config['LONG_AUDIO_CHUNKING'] and len(audio) > app.config['LONG_AUDIO_CHUNK_SECONDS'] * SAMPLE_RATE:
+        print(f"Splitting {len(audio) / SAMPLE_RATE:.1f}s of audio into chunks for parallel transcription...")
+        # Chunks go straight to the pool rather than the batcher so they spread across workers
+        return transcribe_long(
+            partial(inference_pool.submit_transcription, priority=priority), model_name, audio, options,
+            timeout=inference_pool.timeout,
+            max_in_flight=max(inference_pool.workers, 1),
+            chunk_seconds=app.config['LONG_AUDIO_CHUNK_SECONDS']
+        )
+    return submit_transcription(model_name, audio, options, priority).result(timeout=inference_pool.timeout)
+
+def transcribe_audio(model_name, audio, options=None, priority=None):
+    """Transcribe decoded 16 kHz audio, skipping non-speech regions first when VAD is enabled"""
+    if not app.config['VAD_ENABLED']:
+        return run_transcription(model_name, audio, options, priority)
+    
+    started = time.perf_counter()
+    speech = trim_silence(audio, margin_db=app.config['VAD_MARGIN_DB'], padding_ms=app.config['VAD_PADDING_MS'])
+    metrics.observe_stage('vad', time.perf_counter() - started)
+    if not speech.has_speech:
+        print(f"No speech detected, skipping {speech.skipped_seconds:.2f}s of audio")
+        return {'text': '', 'language': 'unknown', 'segments': [], 'vad': speech.summary()}
+    
+    result = dict(run_transcription(model_name, speech.audio, options, priority))
+    # Segment timestamps refer to the trimmed audio; map them back onto the original clip
+    result['segments'] = [
+        dict(segment, start=speech.to_original_time(segment['start']), end=speech.to_original_time(segment['end']))
+        for segment in result['segments']
+    ]
+    result['vad'] = speech.summary()
+    return result
+
+def request_value(name):
+    """A request parameter from the form fields, query string or JSON body"""
+    if 'form_fields' in g:
+        # The body was consumed by a streamed upload; its fields were parsed on the way
+        value = g.form_fields.get(name, request.args.get(name))
+    else:
+        value = request.values.get(name)
+    if value is None and request.is_json:
+        value = (request.get_json(silent=True) or {}).get(name)
+    return value
+
+def requested_transcription(session_id=None, priority=DEFAULT_PRIORITY):
+    """Model, decoding options, scheduling class and their provenance for this request, as a plan dict
+
+    ``model`` picks the Whisper model and ``precision`` (fp32 or int8) its weights;
+    both fall back to the deployment defaults. ``profile`` selects a decoding
+    profile (defaults to DECODING_PROFILE). ``language`` is a hint that skips
+    language detection; without one, the language detected earlier in the same
+    session is reused. English audio is routed to an English-only model.
+    ``priority`` (interactive or bulk) overrides the endpoint's default
+    scheduling class.
+    """
+    name = request_value('model')
+    model_name = registry.resolve(name, request_value('precision'))
+    profile = request_value('profile') or app.config['DECODING_PROFILE']
+    options = profile_options(profile, app.config['DECODING_PROFILES'])
+    language = normalize_language(request_value('language'))
+    source = 'hint'
+    if language is None:
+        language = language_memory.get(session_id)
+        source = 'session' if language else 'detected'
+    
+    if language:
+        options['language'] = language
+    if language == 'en' and app.config['ENGLISH_MODEL_ROUTING']:
+        # A configured English model only replaces the default, never an explicit choice
+        model_name = registry.english_variant(model_name, None if name else app.config['ENGLISH_MODEL'] or None)
+    return {
+        'model': model_name,
+        'options': options,
+        'profile': profile,
+        'language_source': source,
+        'session_id': session_id,
+        'priority': normalize_priority(request_value('priority'), priority),
+    }
+
+def requested_session_id():
+    """Session ID supplied via form field, query string or JSON body"""
+    return request_value('session_id')
+
+def transcription_response(plan, audio, key=None):
+    """Transcribe decoded audio according to ``plan`` into the API response payload, caching it under ``key``
+
+    ``key`` identifies the audio, model and options. A request whose key is
+    already being transcribed shares that result instead of running again.
+    """
+    if key is None or coalescer is None:
+        return compute_transcription_response(plan, audio, key)
+    response, coalesced = coalescer.run(key, compute_transcription_response, plan, audio, key)
+    if not coalesced:
+        return response
+    metrics.increment('coalesced_requests_total',
+                      help_text='Requests answered by joining an identical transcription already in flight')
+    language_memory.remember(plan['session_id'], response['language'])
+    return dict(response, language_source=plan['language_source'], coalesced=True)
+
+def compute_transcription_response(plan, audio, key=None):
+    """Run the transcription behind transcription_response"""
+    result = transcribe_audio(plan['model'], audio, plan['options'], plan['priority'])
+    language_memory.remember(plan['session_id'], result['language'])
+    response = {
+        'status': 'success',
+        'transcription': result['text'],
+        'language': result['language'],
+        'language_source': plan['language_source'],
+        'duration': duration_seconds(audio),
+        'model': plan['model'],
+        'profile': plan['profile'],
+        'retries': result.get('retries', 0),
+        'vad': result.get('vad')
+    }
+    if key and transcription_cache and not result.get('mock'):
+        transcription_cache.put(key, response)
+    return response
+
+def cached_response(plan, cached):
+    """A cached response as an answer to this request, with this request's language provenance"""
+    # The stored entry describes whichever request computed it: a hinted
+    # language and a detected one share a key, but not their language_source
+    language_memory.remember(plan['session_id'], cached['language'])
+    return dict(cached, language_source=plan['language_source'], cached=True)
+
+def transcribe_upload(plan, upload):
+    """Transcribe one streamed upload, answering repeats from the cache"""
+    key = digest_cache_key(upload.digest, plan['model'], plan['options'])
+    cached = transcription_cache.get(key) if transcription_cache else None
+    if cached is not None:
+        return cached_response(plan, cached)
+    audio = finish_upload(upload)
+    return dict(transcription_response(plan, audio, key), cached=False)
+
+def receive_upload():
+    """Read the request's multipart body in bounded chunks, decoding its ``audio`` file as it arrives
+
+    Uploads over MAX_UPLOAD_BYTES are refused from their Content-Length when
+    one is sent, otherwise once that many bytes have been read. The form
+    fields arrive in the same body, so they are kept for request_value().
+    """
+    max_bytes = app.config['MAX_UPLOAD_BYTES']
+    if request.content_length and request.content_length > max_bytes:
+        raise UploadTooLargeError(f"Upload is larger than the {max_bytes // (1024 * 1024)} MB limit")
+    upload = receive_audio_upload(
+        request.stream, request.content_type,
+        max_bytes=max_bytes,
+        max_seconds=app.config['MAX_UPLOAD_SECONDS'],
+        chunk_size=app.config['UPLOAD_CHUNK_BYTES']
+    )
+    g.form_fields = upload.fields
+    return upload
+
+def finish_upload(upload):
+    """Wait for a streamed upload's decode; the decode stage only counts what did not overlap the transfer"""
+    started = time.perf_counter()
+    audio = upload.audio()
+    metrics.observe_stage('decode', time.perf_counter() - started)
+    return audio
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_time(response):
+    if 'request_started' in g and request.endpoint not in (None, 'prometheus_metrics'):
+        metrics.observe('request_seconds', time.perf_counter() - g.request_started,
+                        {'endpoint': request.endpoint, 'status': response.status_code},
+                        help_text='End-to-end request handling time')
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def prometheus_metrics():
+    """Per-stage latency histograms and service gauges in the Prometheus text format"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -64,10 +412,43 @@ def health_check():
     return jsonify({
         'status': 'healthy',
         'timestamp': datetime.now().isoformat(),
-        'model_loaded': model is not None,
-        'model_type': 'whisper' if hasattr(model, 'transcribe') and not isinstance(model, type) else 'mock'
+        'ready': inference_pool.ready,
+        'model_loaded': inference_pool.ready,
+        'model_type': inference_pool.model_type or 'mock',
+        'inference': inference_pool.status(),
+        'batching': batcher.status() if batcher else None,
+        'cache': transcription_cache.stats() if transcription_cache else None,
+        'coalescing': coalescer.status() if coalescer else None,
+        'jobs': jobs.status(),
+        'language_memory': language_memory.status()
     })
 
+@app.route('/health/live', methods=['GET'])
+def liveness():
+    """Liveness probe: the process is up and serving requests"""
+    return jsonify({'status': 'alive', 'timestamp': datetime.now().isoformat()})
+
+@app.route('/health/ready', methods=['GET'])
+def readiness():
+    """Readiness probe: 200 only once every inference worker has loaded and warmed up its model"""
+    status = inference_pool.status()
+    body = {
+        'status': 'ready' if inference_pool.ready else ('failed' if inference_pool.startup_error else 'starting'),
+        'timestamp': datetime.now().isoformat(),
+        'model_type': inference_pool.model_type,
+        'startup_seconds': status['startup_seconds'],
+        'startup_error': status['startup_error'],
+        'workers': status['worker_processes'],
+    }
+    return jsonify(body), 200 if inference_pool.ready else 503
+
+@app.route('/models', methods=['GET'])
+def list_models():
+    """List selectable Whisper models and the ones loaded by each inference worker"""
+    status = registry.status()
+    status['workers'] = list(inference_pool.worker_status.values())
+    return jsonify(status)
+
 @app.route('/', methods=['GET'])
 def root():
     """Root endpoint for testing"""
@@ -75,142 +456,94 @@ def root():
         'message': 'Speech-to-Text Backend is running!',
         'endpoints': [
             '/health - Health check',
+            '/health/live - Liveness probe',
+            '/health/ready - Readiness probe (503 until models are loaded and warmed up)',
+            '/metrics - Per-stage latency histograms and gauges (Prometheus format)',
+            '/models - List available and loaded Whisper models',
             '/transcribe-file - Transcribe uploaded audio file',
+            '/transcribe-batch - Transcribe many uploaded files, streaming NDJSON results',
             '/start-recording - Start audio recording',
             '/stop-recording - Stop recording and get transcription',
-            '/recording-status - Get recording status'
+            '/recording-status - Get recording status',
+            '/jobs - Submit an audio file for asynchronous transcription',
+            '/jobs/<job_id> - Poll (or long-poll with ?wait=N) a transcription job',
+            '/stream/start - Open a live transcription stream',
+            '/stream/<stream_id>/chunk - Send raw PCM audio and get partial results',
+            '/stream/<stream_id>/finish - Close a stream and get the final transcript'
         ],
         'status': 'ready'
     })
 
 @app.route('/start-recording', methods=['POST'])
 def start_recording():
-    """Start audio recording"""
-    global is_recording, stream, recording
-    
+    """Start audio recording in a new session"""
     try:
-        if is_recording:
-            return jsonify({'error': 'Already recording'}), 400
-        
-        # Clear previous recording
-        recording.clear()
-        
-        # Start recording (with fallback)
-        try:
-            samplerate = 16000
-            print(f"Starting audio recording at {samplerate}Hz...")
-            stream = sd.InputStream(
-                samplerate=samplerate, 
-                channels=1, 
-                callback=audio_callback,
-                blocksize=1024
-            )
-            stream.start()
-            is_recording = True
-            print("Real audio recording started successfully")
-        except Exception as audio_error:
-            print(f"Audio recording error: {audio_error}")
-            # Mock recording for testing
-            is_recording = True
-            recording.clear()
-            print("Using mock audio recording...")
-        
+        session = recordings.start(request_value('client_session_id'))
         return jsonify({
             'status': 'recording_started',
-            'message': 'Recording started successfully'
+            'message': 'Recording started successfully',
+            'session_id': session.id
         })
         
+    except SessionLimitError as e:
+        return jsonify({'error': str(e)}), 429
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 @app.route('/stop-recording', methods=['POST'])
 def stop_recording():
-    """Stop recording and return transcription"""
-    global is_recording, stream, recording
-    
+    """Stop a recording session and return its transcription"""
     try:
-        if not is_recording:
+        session_id = requested_session_id()
+        if not session_id:
+            return jsonify({'error': 'session_id is required'}), 400
+        
+        try:
+            client_session_id = recordings.get(session_id).client_session_id
+        except SessionNotFoundError:
             return jsonify({'error': 'Not currently recording'}), 400
+        try:
+            # Language memory follows the client's session, not this one-off recording ID
+            plan = requested_transcription(client_session_id)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        model_name = plan['model']
         
         # Stop recording
-        if stream:
-            try:
-                stream.stop()
-                stream.close()
-            except Exception as e:
-                print(f"Error stopping stream: {e}")
-            finally:
-                stream = None
-        
-        is_recording = False
+        try:
+            session = recordings.stop(session_id)
+        except SessionNotFoundError:
+            return jsonify({'error': 'Not currently recording'}), 400
+        # The ring buffer already holds 16 kHz float32 samples: no temp file, no re-decode
+        audio = session.audio()
         
         # Always return a transcription (mock or real)
         try:
-            print(f"Recording array length: {len(recording)}")
-            print(f"Recording array contents: {[len(r) if hasattr(r, '__len__') else type(r) for r in recording[:3]]}")
-            
             # Check if we have real audio data
-            if recording and len(recording) > 0:
+            if audio is not None and len(audio) > 0:
                 try:
-                    # Convert recording to audio file
-                    print("Concatenating audio data...")
-                    audio_data = np.concatenate(recording, axis=0)
-                    print(f"Audio data shape: {audio_data.shape}, dtype: {audio_data.dtype}")
-                    
-                    # Create temporary file
-                    with tempfile.NamedTemporaryFile(suffix='.wav', delete=False) as temp_file:
-                        temp_filename = temp_file.name
-                        print(f"Writing audio to temp file: {temp_filename}")
-                        wav.write(temp_filename, 16000, audio_data)
-                    
-                    try:
-                        # Try to transcribe with real Whisper
-                        if hasattr(model, 'transcribe') and not isinstance(model, type):
-                            print("Transcribing audio with Whisper...")
-                            audio, sr = librosa.load(temp_filename, sr=16000)
-                            print(f"Loaded audio: shape={audio.shape}, sr={sr}")
-                            result = model.transcribe(audio)
-                            
-                            return jsonify({
-                                'status': 'success',
-                                'transcription': result['text'].strip(),
-                                'language': result.get('language', 'unknown'),
-                                'duration': len(audio_data) / 16000
-                            })
-                        else:
-                            raise Exception("Whisper model not available")
-                            
-                    except Exception as transcribe_error:
-                        print(f"Whisper transcription failed: {transcribe_error}")
-                        # Fall back to mock transcription
-                        result = model.transcribe(None)
-                        return jsonify({
-                            'status': 'success',
-                            'transcription': result['text'],
-                            'language': result['language'],
-                            'duration': len(audio_data) / 16000
-                        })
-                    finally:
-                        # Clean up temporary file
-                        if temp_filename and os.path.exists(temp_filename):
-                            try:
-                                os.unlink(temp_filename)
-                            except Exception as cleanup_error:
-                                print(f"Error cleaning up temp file: {cleanup_error}")
-                except Exception as audio_error:
-                    print(f"Audio processing error: {audio_error}")
+                    print(f"Transcribing {len(audio) / SAMPLE_RATE:.1f}s of recorded audio with Whisper ({model_name})...")
+                    response = transcription_response(plan, audio)
+                    response['duration'] = len(audio) / SAMPLE_RATE
+                    if session.overrun_frames:
+                        response['overrun_seconds'] = session.overrun_frames / session.samplerate
+                    return jsonify(response)
+                except QueueFullError as e:
+                    return jsonify({'error': str(e)}), 503
+                except Exception as transcribe_error:
+                    print(f"Whisper transcription failed: {transcribe_error}")
                     # Fall back to mock transcription
-                    result = model.transcribe(None)
+                    result = fallback_model.transcribe(None)
                     return jsonify({
                         'status': 'success',
                         'transcription': result['text'],
                         'language': result['language'],
-                        'duration': 3.0
+                        'duration': len(audio) / SAMPLE_RATE
                     })
             else:
                 # No audio recorded, return mock transcription
                 print("No audio recorded, returning mock transcription")
-                result = model.transcribe(None)
+                result = fallback_model.transcribe(None)
                 return jsonify({
                     'status': 'success',
                     'transcription': result['text'],
@@ -237,125 +570,307 @@ def transcribe_file():
     """Transcribe an uploaded audio file"""
     try:
         print("Received transcribe-file request")
+        received = time.perf_counter()
         
-        if 'audio' not in request.files:
-            print("No audio file in request")
-            return jsonify({'error': 'No audio file provided'}), 400
-        
-        audio_file = request.files['audio']
-        if audio_file.filename == '':
-            print("Empty filename")
-            return jsonify({'error': 'No file selected'}), 400
-        
-        print(f"Received audio file: {audio_file.filename}, size: {audio_file.content_length}")
-        
-        # Check if file has content
-        if audio_file.content_length == 0 or audio_file.content_length is None:
-            print("Empty audio file received")
-            return jsonify({'error': 'Empty audio file provided'}), 400
-        
-        # Determine file extension based on content type or filename
-        file_extension = '.wav'  # default
-        if audio_file.content_type:
-            if 'webm' in audio_file.content_type:
-                file_extension = '.webm'
-            elif 'mp4' in audio_file.content_type:
-                file_extension = '.mp4'
-            elif 'wav' in audio_file.content_type:
-                file_extension = '.wav'
-        elif audio_file.filename:
-            if audio_file.filename.endswith('.webm'):
-                file_extension = '.webm'
-            elif audio_file.filename.endswith('.mp4'):
-                file_extension = '.mp4'
-        
-        print(f"Using file extension: {file_extension}")
-        
-        # Save uploaded file temporarily
-        with tempfile.NamedTemporaryFile(suffix=file_extension, delete=False) as temp_file:
-            audio_file.save(temp_file.name)
-            temp_filename = temp_file.name
+        # The audio is decoded while it uploads; nothing is spooled before work starts
+        try:
+            upload = receive_upload()
+        except (UploadTooLargeError, AudioTooLongError) as e:
+            print(f"Rejecting upload: {e}")
+            return jsonify({'error': str(e)}), 413
+        except UploadError as e:
+            print(f"Upload error: {e}")
+            return jsonify({'error': str(e)}), 400
+        except AudioDecodeError as e:
+            print(f"Audio decode error: {e}")
+            return jsonify({'error': f'Could not decode audio: {e}'}), 400
+        metrics.observe_stage('upload', time.perf_counter() - received)
         
         try:
-            # Transcribe audio
-            print("Transcribing uploaded file...")
+            if upload.filename is None:
+                print("No audio file in request")
+                return jsonify({'error': 'No audio file provided'}), 400
+            if upload.filename == '':
+                print("Empty filename")
+                return jsonify({'error': 'No file selected'}), 400
+            print(f"Received audio file: {upload.filename}, size: {upload.size}")
             
-            # Try to transcribe with real Whisper
-            if hasattr(model, 'transcribe') and not isinstance(model, type):
-                print("Using Whisper for transcription...")
-                try:
-                    # Whisper expects a file path, not numpy array
-                    result = model.transcribe(temp_filename)
-                    transcription_text = result['text'].strip()
-                    language = result.get('language', 'unknown')
-                    
-                    # Get audio duration for response
-                    try:
-                        audio, sr = librosa.load(temp_filename, sr=16000)
-                        duration = len(audio) / sr
-                    except Exception as e:
-                        print(f"Error loading audio for duration: {e}")
-                        duration = 3.0
-                except Exception as e:
-                    print(f"Whisper transcription error: {e}")
-                    # Fall back to mock transcription
-                    result = model.transcribe(None)
-                    transcription_text = result['text']
-                    language = result['language']
-                    duration = 3.0
-            else:
-                print("Using mock transcription...")
-                result = model.transcribe(None)
-                transcription_text = result['text']
-                language = result['language']
-                duration = 3.0
+            # Check if file has content
+            if not upload.size:
+                print("Empty audio file received")
+                return jsonify({'error': 'Empty audio file provided'}), 400
             
-            print(f"Transcription result: {transcription_text[:100]}...")
+            session_id = requested_session_id()
+            try:
+                plan = requested_transcription(session_id)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            model_name = plan['model']
             
-            return jsonify({
-                'status': 'success',
-                'transcription': transcription_text,
-                'language': language,
-                'duration': duration
-            })
+            # Identical uploads (client retries, re-edited sections) are answered from the cache
+            key = digest_cache_key(upload.digest, model_name, plan['options'])
+            cached = transcription_cache.get(key) if transcription_cache else None
+            if cached is not None:
+                print("Returning cached transcription")
+                return jsonify(cached_response(plan, cached))
             
+            try:
+                audio = finish_upload(upload)
+            except AudioTooLongError as e:
+                return jsonify({'error': str(e)}), 413
+            except AudioDecodeError as e:
+                print(f"Audio decode error: {e}")
+                return jsonify({'error': f'Could not decode audio: {e}'}), 400
+        finally:
+            upload.discard()
+        duration = duration_seconds(audio)
+        
+        try:
+            # Transcribe audio
+            print(f"Transcribing uploaded file with Whisper ({model_name})...")
+            response = transcription_response(plan, audio, key)
+            print(f"Transcription result: {response['transcription'][:100]}...")
+            started = time.perf_counter()
+            body = jsonify(dict(response, cached=False))
+            metrics.observe_stage('response', time.perf_counter() - started)
+            return body
+            
+        except QueueFullError as e:
+            print(f"Rejecting transcription: {e}")
+            return jsonify({'error': str(e)}), 503
         except Exception as e:
             print(f"Transcription error: {e}")
             # Fall back to mock transcription
-            result = model.transcribe(None)
+            result = fallback_model.transcribe(None)
             return jsonify({
                 'status': 'success',
                 'transcription': result['text'],
                 'language': result['language'],
-                'duration': 3.0
+                'duration': duration
             })
-        finally:
-            # Clean up temporary file
-            if temp_filename and os.path.exists(temp_filename):
-                try:
-                    os.unlink(temp_filename)
-                except Exception as cleanup_error:
-                    print(f"Error cleaning up temp file: {cleanup_error}")
             
     except Exception as e:
         print(f"Transcribe file error: {e}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/transcribe-batch', methods=['POST'])
+def transcribe_batch():
+    """Transcribe many uploaded files, streaming one NDJSON result line per file as it finishes"""
+    received = time.perf_counter()
+    max_bytes = app.config['MAX_UPLOAD_BYTES'] * app.config['BATCH_UPLOAD_MAX_FILES']
+    if request.content_length and request.content_length > max_bytes:
+        return jsonify({'error': f"Batch is larger than the {max_bytes // (1024 * 1024)} MB limit"}), 413
+    # Each file is decoded while the body arrives; the total size is checked as bytes are read
+    try:
+        fields, uploads = receive_audio_uploads(
+            request.stream, request.content_type,
+            max_bytes=max_bytes,
+            max_file_bytes=app.config['MAX_UPLOAD_BYTES'],
+            max_files=app.config['BATCH_UPLOAD_MAX_FILES'],
+            max_seconds=app.config['MAX_UPLOAD_SECONDS'],
+            chunk_size=app.config['UPLOAD_CHUNK_BYTES']
+        )
+    except UploadTooLargeError as e:
+        print(f"Rejecting batch: {e}")
+        return jsonify({'error': f"Batch is larger than the {max_bytes // (1024 * 1024)} MB limit"}), 413
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    g.form_fields = fields
+    for upload in uploads:
+        if not upload.filename:
+            upload.discard()
+    uploads = [u for u in uploads if u.filename]
+    if not uploads:
+        return jsonify({'error': 'No audio files provided'}), 400
+    try:
+        plan = requested_transcription(requested_session_id(), priority='bulk')
+    except ValueError as e:
+        for upload in uploads:
+            upload.discard()
+        return jsonify({'error': str(e)}), 400
+    
+    metrics.observe_stage('upload', time.perf_counter() - received)
+    print(f"Received batch of {len(uploads)} files ({sum(u.size for u in uploads)} bytes) for {plan['model']}")
+    
+    def transcribe(upload):
+        try:
+            if upload.error is not None:
+                raise upload.error
+            if not upload.size:
+                raise ValueError('Empty audio file provided')
+            return transcribe_upload(plan, upload)
+        except (UploadTooLargeError, AudioTooLongError) as e:
+            raise ValueError(str(e))
+        except AudioDecodeError as e:
+            raise ValueError(f'Could not decode audio: {e}')
+        finally:
+            upload.discard()
+    
+    return Response(stream_batch(uploads, transcribe, batch_runners), mimetype='application/x-ndjson',
+                    headers={'X-Accel-Buffering': 'no', 'Cache-Control': 'no-cache'})
+
 @app.route('/recording-status', methods=['GET'])
 def recording_status():
-    """Get current recording status"""
+    """Get the status of one recording session, or of all sessions when no ID is given"""
+    session_id = requested_session_id()
+    if not session_id:
+        return jsonify(recordings.status())
+    try:
+        return jsonify(recordings.get(session_id).status())
+    except SessionNotFoundError:
+        return jsonify({
+            'session_id': session_id,
+            'is_recording': False,
+            'recording_length': 0
+        })
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """Queue an uploaded audio file for asynchronous transcription"""
+    received = time.perf_counter()
+    try:
+        upload = receive_upload()
+    except (UploadTooLargeError, AudioTooLongError) as e:
+        return jsonify({'error': str(e)}), 413
+    except UploadError as e:
+        return jsonify({'error': str(e)}), 400
+    except AudioDecodeError as e:
+        return jsonify({'error': f'Could not decode audio: {e}'}), 400
+    metrics.observe_stage('upload', time.perf_counter() - received)
+    
+    try:
+        if upload.filename is None:
+            return jsonify({'error': 'No audio file provided'}), 400
+        if not upload.size:
+            return jsonify({'error': 'Empty audio file provided'}), 400
+        session_id = requested_session_id()
+        try:
+            plan = requested_transcription(session_id, priority='bulk')
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        model_name = plan['model']
+        
+        key = digest_cache_key(upload.digest, model_name, plan['options'])
+        cached = transcription_cache.get(key) if transcription_cache else None
+        if cached is not None:
+            job = jobs.add_completed(cached['duration'], model_name, cached_response(plan, cached))
+            return jsonify(job.to_dict()), 200
+        
+        try:
+            audio = finish_upload(upload)
+        except AudioTooLongError as e:
+            return jsonify({'error': str(e)}), 413
+        except AudioDecodeError as e:
+            return jsonify({'error': f'Could not decode audio: {e}'}), 400
+    finally:
+        upload.discard()
+    
+    try:
+        job = jobs.submit(duration_seconds(audio), model_name, transcription_response, plan, audio, key)
+    except OverloadedError as e:
+        print(f"Shedding job: {e}")
+        response = jsonify({'error': str(e), 'retry_after': e.retry_after})
+        response.headers['Retry-After'] = str(e.retry_after)
+        return response, 429
+    
+    body = job.to_dict()
+    body['status_url'] = f"/jobs/{job.id}"
+    body['estimated_wait_seconds'] = round(jobs.estimated_drain_seconds(), 1)
+    return jsonify(body), 202
+
+@app.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Job status and result; ?wait=N long-polls up to N seconds for completion"""
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown or expired job'}), 404
+    try:
+        wait = min(float(request.args.get('wait', 0)), app.config['JOB_MAX_WAIT_SECONDS'])
+    except ValueError:
+        return jsonify({'error': 'wait must be a number of seconds'}), 400
+    return jsonify(jobs.wait(job, wait).to_dict())
+
+@app.route('/stream/start', methods=['POST'])
+def stream_start():
+    """Open a live transcription stream"""
+    try:
+        plan = requested_transcription(requested_session_id())
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    model_name = plan['model']
+    try:
+        # Streams always decode greedily; partial results must keep up with the speaker
+        session = streams.open(model_name, language=plan['options'].get('language'))
+    except SessionLimitError as e:
+        return jsonify({'error': str(e)}), 429
     return jsonify({
-        'is_recording': is_recording,
-        'recording_length': len(recording) if recording else 0
+        'status': 'stream_started',
+        'stream_id': session.id,
+        'sample_rate': SAMPLE_RATE,
+        'formats': ['s16le', 'f32le'],
+        'model': model_name,
+        'language': session.language,
+        'language_source': plan['language_source']
     })
 
+@app.route('/stream/<stream_id>/chunk', methods=['POST'])
+def stream_chunk(stream_id):
+    """Append a raw mono PCM chunk (16 kHz) and return the current partial and committed text"""
+    try:
+        session = streams.get(stream_id)
+    except SessionNotFoundError:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    try:
+        samples = pcm_chunk_to_float32(request.get_data(), request.args.get('format', 's16le'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify(session.feed(samples))
+
+@app.route('/stream/<stream_id>/finish', methods=['POST'])
+def stream_finish(stream_id):
+    """Close a stream, transcribe the remaining tail and return the final transcript"""
+    try:
+        session = streams.close(stream_id)
+    except SessionNotFoundError:
+        return jsonify({'error': 'Unknown or expired stream'}), 404
+    try:
+        result = session.finish()
+    except QueueFullError as e:
+        return jsonify({'error': str(e)}), 503
+    except FutureTimeoutError:
+        print(f"Final pass of stream {stream_id[:8]} timed out")
+        return jsonify({'error': 'Transcription timed out'}), 503
+    except Exception as e:
+        print(f"Stream finish error: {e}")
+        return jsonify({'error': str(e)}), 500
+    result['transcription'] = result['committed']
+    result['duration'] = result['received_seconds']
+    result['model'] = session.model_name
+    return jsonify(result)
+
 if __name__ == '__main__':
     print("Starting Flask server...")
     print("Available endpoints:")
     print("  GET  /health - Health check")
-    print("  POST /start-recording - Start audio recording")
-    print("  POST /stop-recording - Stop recording and get transcription")
+    print("  GET  /health/live - Liveness probe")
+    print("  GET  /health/ready - Readiness probe")
+    print("  GET  /metrics - Prometheus metrics")
+    print("  GET  /models - List available and loaded Whisper models")
+    print("  POST /start-recording - Start audio recording (returns session_id)")
+    print("  POST /stop-recording - Stop recording session and get transcription")
     print("  POST /transcribe-file - Transcribe uploaded audio file")
     print("  GET  /recording-status - Get recording status")
+    print("  POST /jobs - Submit audio file for asynchronous transcription")
+    print("  GET  /jobs/<job_id> - Poll a transcription job (?wait=N to long-poll)")
+    print("  POST /stream/start - Open a live transcription stream")
+    print("  POST /stream/<stream_id>/chunk - Send PCM audio, get partial results")
+    print("  POST /stream/<stream_id>/finish - Close stream and get final transcript")
+    
+    # With the reloader, only the serving child process starts workers. They load
+    # and warm up in the background while the server binds; /health/ready reports
+    # when they can take traffic.
+    use_reloader = app.config['USE_RELOADER']
+    if not use_reloader or os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        inference_pool.start_in_background()
     
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    app.run(debug=app.debug, use_reloader=use_reloader, host=app.config['HOST'], port=app.config['PORT'])
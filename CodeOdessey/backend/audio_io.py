@@ -0,0 +1,401 @@
+"""
+In-memory audio ingestion: decode uploaded bytes once into 16 kHz mono float32
+
+The container is identified from its leading bytes, never from the filename
+or Content-Type (browsers label webm recordings as .wav). PCM WAV is parsed
+directly into NumPy and resampled with a polyphase filter when needed; only
+compressed formats pay for an ffmpeg subprocess.
+"""
+
+import os
+import struct
+import subprocess
+import tempfile
+import threading
+from math import gcd
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+
+# WAV headers (fmt, LIST, bext, ...) larger than this are left to ffmpeg
+WAV_HEADER_LIMIT = 1024 * 1024
+
+_WAVE_FORMAT_PCM = 0x0001
+_WAVE_FORMAT_IEEE_FLOAT = 0x0003
+_WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+class AudioDecodeError(Exception):
+    """Raised when uploaded bytes cannot be decoded as audio"""
+
+
+class AudioTooLongError(AudioDecodeError):
+    """Raised when decoded audio exceeds the maximum accepted duration"""
+
+
+def _ffmpeg_command(source, sample_rate=SAMPLE_RATE):
+    return [
+        'ffmpeg', '-nostdin', '-threads', '0',
+        '-i', source,
+        '-f', 's16le', '-ac', '1', '-acodec', 'pcm_s16le', '-ar', str(sample_rate),
+        '-loglevel', 'error', 'pipe:1'
+    ]
+
+
+def sniff_format(head):
+    """Identify an audio container from its first bytes: wav, webm, ogg, mp4, flac, mp3 or unknown"""
+    if head[:4] in (b'RIFF', b'RIFX') and head[8:12] == b'WAVE':
+        return 'wav'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'webm'
+    if head[:4] == b'OggS':
+        return 'ogg'
+    if head[4:8] == b'ftyp':
+        return 'mp4'
+    if head[:4] == b'fLaC':
+        return 'flac'
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'mp3'
+    return 'unknown'
+
+
+class WavFormat:
+    """Sample layout of a PCM WAV file and where its sample data starts"""
+
+    def __init__(self, dtype, channels, sample_rate, data_offset, data_size):
+        self.dtype = dtype
+        self.channels = channels
+        self.sample_rate = sample_rate
+        self.data_offset = data_offset
+        self.data_size = data_size
+        self.frame_bytes = (3 if dtype == 'i3' else np.dtype(dtype).itemsize) * channels
+
+
+def parse_wav_header(head):
+    """Parse the RIFF header at the start of ``head``
+
+    Returns a WavFormat once the data chunk has been reached, or None while
+    more bytes are needed. Raises ValueError for layouts the native path does
+    not handle (compressed WAV, big-endian RIFX), which go to ffmpeg instead.
+    """
+    if len(head) < 12:
+        return None
+    if head[:4] != b'RIFF' or head[8:12] != b'WAVE':
+        raise ValueError('not a little-endian RIFF/WAVE file')
+    offset = 12
+    fmt = None
+    while offset + 8 <= len(head):
+        chunk_id = head[offset:offset + 4]
+        chunk_size = struct.unpack_from('<I', head, offset + 4)[0]
+        body = offset + 8
+        if chunk_id == b'data':
+            if fmt is None:
+                raise ValueError('data chunk before fmt chunk')
+            tag, channels, rate, bits = fmt
+            # Streaming recorders leave the size at 0 or 0xFFFFFFFF; read to the end instead
+            size = chunk_size if 0 < chunk_size < 0xFFFFFFFF else None
+            return WavFormat(_wav_dtype(tag, bits), channels, rate, body, size)
+        if body + chunk_size > len(head):
+            return None
+        if chunk_id == b'fmt ':
+            if chunk_size < 16:
+                raise ValueError('truncated fmt chunk')
+            tag, channels, rate, _, _, bits = struct.unpack_from('<HHIIHH', head, body)
+            if tag == _WAVE_FORMAT_EXTENSIBLE and chunk_size >= 40:
+                # The real format tag is the first two bytes of the SubFormat GUID
+                tag = struct.unpack_from('<H', head, body + 24)[0]
+            if channels < 1 or rate < 1:
+                raise ValueError('invalid channel count or sample rate')
+            fmt = (tag, channels, rate, bits)
+        # Chunks are word aligned
+        offset = body + chunk_size + (chunk_size & 1)
+    return None
+
+
+def _wav_dtype(tag, bits):
+    if tag == _WAVE_FORMAT_PCM and bits in (8, 16, 24, 32):
+        return {8: 'u1', 16: '<i2', 24: 'i3', 32: '<i4'}[bits]
+    if tag == _WAVE_FORMAT_IEEE_FLOAT and bits in (32, 64):
+        return '<f4' if bits == 32 else '<f8'
+    raise ValueError(f'unsupported WAV encoding (format {tag:#06x}, {bits} bits)')
+
+
+def wav_frames_to_float32(buffer, fmt):
+    """Convert whole frames of WAV sample data to mono float32 in [-1, 1)
+
+    The bytes are viewed in place with ``np.frombuffer``; the only copy is the
+    conversion to float32 (16 kHz mono float WAV needs none at all).
+    """
+    if fmt.dtype == 'i3':
+        # 24-bit samples: widen each little-endian triplet into the top of an int32
+        raw = np.frombuffer(buffer, np.uint8).reshape(-1, 3)
+        samples = (raw[:, 0].astype(np.int32) << 8 | raw[:, 1].astype(np.int32) << 16
+                   | raw[:, 2].astype(np.int8).astype(np.int32) << 24)
+        scale = 1.0 / 2147483648.0
+    else:
+        samples = np.frombuffer(buffer, fmt.dtype)
+        scale = {'u1': 1.0 / 128.0, '<i2': 1.0 / 32768.0, '<i4': 1.0 / 2147483648.0}.get(fmt.dtype)
+    if fmt.channels > 1:
+        samples = samples.reshape(-1, fmt.channels).mean(axis=1, dtype=np.float32)
+    if fmt.dtype == 'u1':
+        return ((samples.astype(np.float32) - 128.0) * scale).astype(np.float32, copy=False)
+    if scale is None:
+        return samples.astype(np.float32, copy=False)
+    return (samples * np.float32(scale)).astype(np.float32, copy=False)
+
+
+def resample(audio, source_rate, target_rate=SAMPLE_RATE):
+    """Polyphase resampling (anti-aliased, vectorized) between integer sample rates"""
+    if source_rate == target_rate:
+        return audio
+    from scipy.signal import resample_poly
+    divisor = gcd(int(source_rate), int(target_rate))
+    return resample_poly(audio, target_rate // divisor, source_rate // divisor).astype(np.float32, copy=False)
+
+
+def _decode_wav(data, sample_rate):
+    """Decode a complete PCM WAV natively, or return None to hand it to ffmpeg"""
+    try:
+        fmt = parse_wav_header(memoryview(data)[:WAV_HEADER_LIMIT].tobytes())
+    except ValueError:
+        return None
+    if fmt is None:
+        return None
+    end = len(data) if fmt.data_size is None else min(len(data), fmt.data_offset + fmt.data_size)
+    end -= (end - fmt.data_offset) % fmt.frame_bytes
+    audio = wav_frames_to_float32(memoryview(data)[fmt.data_offset:end], fmt)
+    return resample(audio, fmt.sample_rate, sample_rate)
+
+
+def _run_ffmpeg(source, data=None, sample_rate=SAMPLE_RATE):
+    cmd = _ffmpeg_command(source, sample_rate)
+    try:
+        return subprocess.run(cmd, input=data, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise AudioDecodeError("ffmpeg is not installed or not in PATH")
+    except subprocess.CalledProcessError as e:
+        raise AudioDecodeError(e.stderr.decode(errors='ignore').strip() or "ffmpeg failed to decode audio")
+
+
+def pcm16_to_float32(pcm):
+    """Convert little-endian 16-bit PCM bytes to float32 samples in [-1, 1)"""
+    return np.frombuffer(pcm, np.int16).astype(np.float32) / 32768.0
+
+
+def _check_duration(samples, sample_rate, max_seconds):
+    if max_seconds and samples > max_seconds * sample_rate:
+        raise AudioTooLongError(f"Audio is longer than the {max_seconds:g}s limit")
+
+
+def decode_audio_bytes(data, sample_rate=SAMPLE_RATE, max_seconds=None):
+    """Decode an in-memory audio file into a mono float32 array at ``sample_rate``
+
+    PCM WAV is parsed natively. Anything else is piped through ffmpeg, so
+    nothing is written to disk. Some MP4 files keep their index at the end of
+    the file and cannot be decoded from a pipe; only those are spooled to a
+    temporary file as a fallback.
+    """
+    if not data:
+        raise AudioDecodeError("Empty audio data")
+    if sniff_format(data[:12]) == 'wav':
+        audio = _decode_wav(data, sample_rate)
+        if audio is not None:
+            _check_duration(len(audio), sample_rate, max_seconds)
+            return audio
+    try:
+        pcm = _run_ffmpeg('pipe:0', data, sample_rate)
+    except AudioDecodeError as pipe_error:
+        if sniff_format(data[:12]) != 'mp4':
+            raise
+        print(f"Pipe decode failed for MP4 input ({pipe_error}), retrying from a temp file")
+        with tempfile.NamedTemporaryFile(suffix='.mp4', delete=False) as temp_file:
+            temp_file.write(data)
+            temp_filename = temp_file.name
+        try:
+            pcm = _run_ffmpeg(temp_filename, None, sample_rate)
+        finally:
+            os.unlink(temp_filename)
+    _check_duration(len(pcm) // 2, sample_rate, max_seconds)
+    return pcm16_to_float32(pcm)
+
+
+class StreamingDecoder:
+    """Decodes audio while it is still arriving
+
+    The container is sniffed from the first bytes. PCM WAV is converted
+    natively chunk by chunk; anything else goes straight into a running
+    ffmpeg process whose PCM a reader thread collects. Either way decoding
+    overlaps with the upload and no copy of the encoded file is kept in
+    memory. Audio longer than ``max_seconds`` stops the decode as soon as it
+    is detected. MP4 input may need random access to its index, so only MP4
+    is also spooled to a temporary file and decoded from there if the pipe fails.
+    """
+
+    def __init__(self, sample_rate=SAMPLE_RATE, max_seconds=None):
+        self.sample_rate = sample_rate
+        self.max_seconds = max_seconds
+        self.bytes_fed = 0
+        self.too_long = False
+        # 'wav' (native) or 'ffmpeg', chosen once enough of the header has arrived
+        self.mode = None
+        self._head = bytearray()
+        self._wav = None
+        self._wav_left = None
+        self._remainder = b''
+        self._samples = []
+        self._frames = 0
+        self._max_pcm_bytes = int(max_seconds * sample_rate) * 2 if max_seconds else None
+        self._process = None
+        self._spool = None
+        self._pcm = []
+        self._pcm_bytes = 0
+        self._stderr = b''
+        self._threads = []
+
+    def feed(self, chunk):
+        if not chunk:
+            return
+        self.bytes_fed += len(chunk)
+        if self.mode is None:
+            self._head += chunk
+            self._choose_mode(final=False)
+        elif self.mode == 'wav':
+            self._feed_wav(chunk)
+        else:
+            self._feed_ffmpeg(chunk)
+
+    def finish(self):
+        """Wait for the decode to complete and return the float32 samples"""
+        try:
+            if self.mode is None:
+                if not self._head:
+                    raise AudioDecodeError("Empty audio data")
+                self._choose_mode(final=True)
+            if self.mode == 'wav':
+                audio = np.concatenate(self._samples) if self._samples else np.zeros(0, np.float32)
+                self._samples = []
+                return resample(audio, self._wav.sample_rate, self.sample_rate)
+            try:
+                self._process.stdin.close()
+            except (BrokenPipeError, OSError):
+                pass
+            returncode = self._process.wait()
+            for thread in self._threads:
+                thread.join()
+            if self.too_long:
+                raise AudioTooLongError(f"Audio is longer than the {self.max_seconds:g}s limit")
+            if returncode != 0:
+                error = AudioDecodeError(self._stderr.decode(errors='ignore').strip() or "ffmpeg failed to decode audio")
+                if self._spool is None:
+                    raise error
+                print(f"Pipe decode failed for MP4 input ({error}), retrying from a temp file")
+                self._spool.close()
+                pcm = _run_ffmpeg(self._spool.name, None, self.sample_rate)
+                _check_duration(len(pcm) // 2, self.sample_rate, self.max_seconds)
+                return pcm16_to_float32(pcm)
+            return pcm16_to_float32(b''.join(self._pcm))
+        finally:
+            self.close()
+
+    def close(self):
+        """Stop decoding and release the ffmpeg process and spool file"""
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+            self._process.wait()
+        if self._spool is not None:
+            self._spool.close()
+            os.unlink(self._spool.name)
+            self._spool = None
+
+    def _choose_mode(self, final):
+        head = bytes(self._head)
+        if len(head) < 12 and not final:
+            return
+        if sniff_format(head) == 'wav':
+            try:
+                fmt = parse_wav_header(head[:WAV_HEADER_LIMIT])
+            except ValueError:
+                fmt = False
+            if fmt is None and not final and len(head) < WAV_HEADER_LIMIT:
+                return
+            if fmt:
+                self.mode = 'wav'
+                self._wav = fmt
+                self._wav_left = fmt.data_size
+                self._head = None
+                self._feed_wav(head[fmt.data_offset:])
+                return
+        self.mode = 'ffmpeg'
+        self._head = None
+        self._start_ffmpeg(head)
+        self._feed_ffmpeg(head)
+
+    def _feed_wav(self, data):
+        if self._wav_left is not None:
+            # Ignore chunks (LIST, id3, ...) after the sample data
+            data = data[:self._wav_left]
+            self._wav_left -= len(data)
+        if self._remainder:
+            data = self._remainder + data
+        usable = len(data) - len(data) % self._wav.frame_bytes
+        self._remainder = data[usable:]
+        if not usable:
+            return
+        samples = wav_frames_to_float32(memoryview(data)[:usable], self._wav)
+        self._samples.append(samples)
+        self._frames += len(samples)
+        if self.max_seconds and self._frames > self.max_seconds * self._wav.sample_rate:
+            self.too_long = True
+            self._samples = []
+            raise AudioTooLongError(f"Audio is longer than the {self.max_seconds:g}s limit")
+
+    def _feed_ffmpeg(self, chunk):
+        if self._spool is not None:
+            self._spool.write(chunk)
+        if self.too_long:
+            raise AudioTooLongError(f"Audio is longer than the {self.max_seconds:g}s limit")
+        try:
+            self._process.stdin.write(chunk)
+        except (BrokenPipeError, OSError):
+            # ffmpeg gave up early; finish() reports why (or falls back to the spool)
+            pass
+
+    def _start_ffmpeg(self, head):
+        if sniff_format(head) == 'mp4':
+            self._spool = tempfile.NamedTemporaryFile(suffix='.mp4', delete=False)
+        try:
+            self._process = subprocess.Popen(
+                _ffmpeg_command('pipe:0', self.sample_rate),
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+            )
+        except FileNotFoundError:
+            self.close()
+            raise AudioDecodeError("ffmpeg is not installed or not in PATH")
+        self._threads = [
+            threading.Thread(target=self._read_pcm, daemon=True),
+            threading.Thread(target=self._read_stderr, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def _read_pcm(self):
+        while True:
+            block = self._process.stdout.read(65536)
+            if not block:
+                return
+            self._pcm.append(block)
+            self._pcm_bytes += len(block)
+            if self._max_pcm_bytes and self._pcm_bytes > self._max_pcm_bytes:
+                self.too_long = True
+                self._pcm = []
+                self._process.kill()
+                return
+
+    def _read_stderr(self):
+        self._stderr = self._process.stderr.read()
+
+
+def duration_seconds(audio, sample_rate=SAMPLE_RATE):
+    """Duration of a decoded sample array"""
+    return len(audio) / float(sample_rate)
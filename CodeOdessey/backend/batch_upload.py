@@ -0,0 +1,56 @@
+"""
+Multi-file batch transcription streamed as newline-delimited JSON
+
+A batch upload fans its files out over a shared runner pool so they reach
+the inference workers (and the micro-batcher) together instead of one HTTP
+round trip at a time. Each file's result is written as one JSON line the
+moment it finishes, so a client sees the short clips long before the
+slowest file is done; a final summary line closes the stream.
+"""
+
+import json
+import time
+from concurrent.futures import FIRST_COMPLETED, wait
+
+
+def ndjson(record):
+    return json.dumps(record, separators=(',', ':')) + '\n'
+
+
+def stream_batch(uploads, transcribe, runners):
+    """Yield one NDJSON line per upload as it completes, then a summary line
+
+    ``uploads`` are received files with ``filename``, ``size`` and
+    ``discard()``; ``transcribe(upload)`` returns the response dict for one
+    file and may raise to report a per-file error. Smaller files are
+    dispatched first so early results arrive quickly.
+    """
+    started = time.perf_counter()
+    order = sorted(range(len(uploads)), key=lambda i: uploads[i].size)
+    pending = {runners.submit(transcribe, uploads[i]): i for i in order}
+    succeeded = failed = 0
+    try:
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                index = pending.pop(future)
+                record = {'index': index, 'filename': uploads[index].filename}
+                try:
+                    record.update(future.result())
+                    succeeded += 1
+                except Exception as e:
+                    record.update(status='error', error=str(e))
+                    failed += 1
+                yield ndjson(record)
+    finally:
+        # The client went away: drop files that have not started yet
+        for future, index in pending.items():
+            if future.cancel():
+                uploads[index].discard()
+    yield ndjson({
+        'status': 'complete',
+        'files': len(uploads),
+        'succeeded': succeeded,
+        'failed': failed,
+        'elapsed_seconds': round(time.perf_counter() - started, 3),
+    })
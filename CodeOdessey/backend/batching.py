@@ -0,0 +1,115 @@
+"""
+Dynamic micro-batching of concurrent transcription requests
+
+Requests that arrive close together are held for at most ``max_wait_ms`` and
+grouped by model and decoding options. Each group is sent to the inference
+pool as a single batch task, so a burst of short voice notes shares one
+encoder/decoder pass instead of running one pass per clip.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from audio_io import SAMPLE_RATE
+from inference import transcribe_batch_task
+from scheduling import PRIORITY_CLASSES, normalize_priority
+
+
+class _Pending:
+    def __init__(self, audio, priority):
+        self.audio = audio
+        self.priority = priority
+        self.future = Future()
+        self.arrived_at = time.time()
+
+
+class MicroBatcher:
+    """Collects pending clips into batches of up to ``max_batch_size``"""
+
+    def __init__(self, pool, max_batch_size=8, max_wait_ms=20):
+        self.pool = pool
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.batches = 0
+        self.batched_requests = 0
+        self._pending = OrderedDict()
+        self._cond = threading.Condition()
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, model_name, audio, options=None, priority=None):
+        """Queue one clip; returns a future resolving to its transcription result"""
+        key = (model_name, tuple(sorted((options or {}).items())))
+        item = _Pending(audio, normalize_priority(priority))
+        with self._cond:
+            self._pending.setdefault(key, []).append(item)
+            self._cond.notify()
+        return item.future
+
+    def transcribe(self, model_name, audio, options=None, priority=None):
+        """Submit a clip and wait for its result"""
+        return self.submit(model_name, audio, options, priority).result(timeout=self.pool.timeout)
+
+    def status(self):
+        with self._cond:
+            pending = sum(len(items) for items in self._pending.values())
+        return {
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000,
+            'pending': pending,
+            'batches': self.batches,
+            'average_batch_size': round(self.batched_requests / self.batches, 2) if self.batches else 0,
+        }
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                # Serve the group whose oldest request has waited longest
+                key = min(self._pending, key=lambda k: self._pending[k][0].arrived_at)
+                deadline = self._pending[key][0].arrived_at + self.max_wait
+                while len(self._pending[key]) < self.max_batch_size:
+                    remaining = deadline - time.time()
+                    if remaining <= 0:
+                        break
+                    self._cond.wait(remaining)
+                items = self._pending[key][:self.max_batch_size]
+                rest = self._pending[key][self.max_batch_size:]
+                if rest:
+                    self._pending[key] = rest
+                else:
+                    del self._pending[key]
+            self._dispatch(key, items)
+
+    def _dispatch(self, key, items):
+        model_name, options = key
+        self.batches += 1
+        self.batched_requests += len(items)
+        if self.pool.metrics is not None:
+            now = time.time()
+            for item in items:
+                self.pool.metrics.observe_stage('batch_wait', now - item.arrived_at)
+        # A batch is scheduled as urgently as its most urgent clip
+        priority = min((item.priority for item in items), key=PRIORITY_CLASSES.index)
+        try:
+            future = self.pool.submit(
+                transcribe_batch_task, model_name, [item.audio for item in items], dict(options),
+                priority=priority, audio_seconds=sum(len(item.audio) for item in items) / SAMPLE_RATE
+            )
+        except Exception as e:
+            for item in items:
+                item.future.set_exception(e)
+            return
+        future.add_done_callback(lambda f: self._fan_out(items, f))
+
+    def _fan_out(self, items, future):
+        error = future.exception()
+        if error is not None:
+            for item in items:
+                item.future.set_exception(error)
+            return
+        for item, result in zip(items, future.result()['results']):
+            item.future.set_result(result)
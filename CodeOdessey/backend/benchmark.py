@@ -0,0 +1,353 @@
+#!/usr/bin/env python3
+"""
+Reproducible load and latency benchmark for the transcription backend
+
+Generates a seeded synthetic corpus of speech-like clips in several lengths
+and formats, drives /transcribe-file at one or more concurrency levels and
+reports p50/p95/p99 latency, throughput, real-time factor and peak server
+memory. By default it launches its own server with the latency-simulating
+fake engine, so it runs on any machine without model weights or a GPU.
+
+Usage:
+    python benchmark.py                                   # fake engine, default levels
+    python benchmark.py --concurrency 1,4,16 --requests 64 --fake-rtf 0.2
+    python benchmark.py --engine real --server production --output real.json
+    python benchmark.py --url http://localhost:5000 --pid 1234   # existing server
+    python benchmark.py --compare baseline.json           # print deltas against a previous run
+"""
+
+import argparse
+import io
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+import wave
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+SAMPLE_RATE = 16000
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+FORMAT_ARGS = {
+    'webm': ['-c:a', 'libopus', '-b:a', '32k', '-f', 'webm'],
+    'mp4': ['-c:a', 'aac', '-b:a', '64k', '-f', 'mp4', '-movflags', 'frag_keyframe+empty_moov'],
+}
+
+
+def synthetic_speech(seconds, rng):
+    """Speech-like signal: voiced harmonic syllables with pitch glides, separated by pauses"""
+    audio = np.zeros(int(seconds * SAMPLE_RATE), dtype=np.float32)
+    position = int(rng.uniform(0.1, 0.4) * SAMPLE_RATE)
+    while position < len(audio):
+        length = int(rng.uniform(0.12, 0.35) * SAMPLE_RATE)
+        t = np.arange(min(length, len(audio) - position)) / SAMPLE_RATE
+        f0 = rng.uniform(100, 240) * (1 + 0.1 * np.sin(2 * np.pi * rng.uniform(2, 5) * t))
+        phase = 2 * np.pi * np.cumsum(f0) / SAMPLE_RATE
+        syllable = sum(np.sin(k * phase) / k for k in range(1, 6))
+        envelope = np.sin(np.pi * t / max(t[-1], 1e-3)) if len(t) > 1 else np.ones_like(t)
+        audio[position:position + len(t)] += (0.3 * syllable * envelope).astype(np.float32)
+        # Short gaps between syllables, longer ones between "words"
+        position += len(t) + int(rng.choice([rng.uniform(0.03, 0.08), rng.uniform(0.2, 0.6)]) * SAMPLE_RATE)
+    audio += rng.normal(0, 0.003, len(audio)).astype(np.float32)
+    return np.clip(audio, -1.0, 1.0)
+
+
+def encode(audio, fmt):
+    """Encode float32 samples as WAV (natively) or WebM/MP4 (via ffmpeg)"""
+    pcm = (audio * 32767).astype('<i2').tobytes()
+    if fmt == 'wav':
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as f:
+            f.setnchannels(1)
+            f.setsampwidth(2)
+            f.setframerate(SAMPLE_RATE)
+            f.writeframes(pcm)
+        return buffer.getvalue()
+    cmd = ['ffmpeg', '-nostdin', '-loglevel', 'error', '-f', 's16le', '-ar', str(SAMPLE_RATE), '-ac', '1',
+           '-i', 'pipe:0'] + FORMAT_ARGS[fmt] + ['pipe:1']
+    return subprocess.run(cmd, input=pcm, capture_output=True, check=True).stdout
+
+
+def build_corpus(lengths, formats, seed):
+    """Deterministic list of clips: every length in every available format"""
+    corpus = []
+    for fmt in formats:
+        if fmt != 'wav':
+            try:
+                subprocess.run(['ffmpeg', '-version'], capture_output=True, check=True)
+            except (OSError, subprocess.CalledProcessError):
+                print(f"⚠️  ffmpeg not found; skipping {fmt} clips")
+                continue
+        for seconds in lengths:
+            # Same seed per length, so every format carries the same signal
+            audio = synthetic_speech(seconds, np.random.default_rng(seed + int(seconds * 1000)))
+            corpus.append({'name': f"clip_{seconds:g}s.{fmt}", 'format': fmt, 'seconds': seconds,
+                           'data': encode(audio, fmt)})
+    return corpus
+
+
+def tree_rss_bytes(pid):
+    """Resident memory of a process and all its descendants (Linux /proc), or None"""
+    if not os.path.isdir('/proc'):
+        return None
+    parents = {}
+    for entry in os.listdir('/proc'):
+        if entry.isdigit():
+            try:
+                with open(f'/proc/{entry}/stat') as f:
+                    # The command name may contain spaces; fields resume after its closing paren
+                    parents[int(entry)] = int(f.read().rsplit(')', 1)[1].split()[1])
+            except (OSError, IndexError, ValueError):
+                pass
+    tree, frontier = {pid}, [pid]
+    while frontier:
+        parent = frontier.pop()
+        for child, ppid in parents.items():
+            if ppid == parent and child not in tree:
+                tree.add(child)
+                frontier.append(child)
+    total = 0
+    for member in tree:
+        try:
+            with open(f'/proc/{member}/statm') as f:
+                total += int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+        except (OSError, IndexError, ValueError):
+            pass
+    return total
+
+
+class MemorySampler:
+    """Samples the server's process-tree RSS in the background and keeps the peak"""
+
+    def __init__(self, pid, interval=0.2):
+        self.pid = pid
+        self.interval = interval
+        self.peak = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def __enter__(self):
+        if self.pid:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop.is_set():
+            rss = tree_rss_bytes(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            self._stop.wait(self.interval)
+
+
+def launch_server(args):
+    """Start a local server for the benchmark and wait until it reports ready"""
+    env = dict(os.environ, FLASK_PORT=str(args.port), FLASK_HOST='127.0.0.1', CACHE_ENABLED='0', COALESCE_REQUESTS='0',
+               PYTHONUNBUFFERED='1')
+    if args.engine == 'fake':
+        env['FAKE_ENGINE_RTF'] = str(args.fake_rtf)
+        env['FAKE_ENGINE_OVERHEAD_MS'] = str(args.fake_overhead_ms)
+    if args.server == 'production':
+        env['FLASK_ENV'] = 'production'
+        cmd = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
+    else:
+        env['FLASK_ENV'] = 'development'
+        cmd = [sys.executable, 'app.py']
+    log = open(os.path.join(BACKEND_DIR, 'benchmark_server.log'), 'w')
+    process = subprocess.Popen(cmd, cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT)
+    url = f"http://127.0.0.1:{args.port}"
+    deadline = time.time() + args.startup_timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise SystemExit(f"❌ Server exited during startup; see benchmark_server.log")
+        try:
+            if requests.get(f"{url}/health/ready", timeout=2).status_code == 200:
+                return process, url
+        except requests.exceptions.ConnectionError:
+            pass
+        time.sleep(0.5)
+    process.terminate()
+    raise SystemExit(f"❌ Server was not ready within {args.startup_timeout}s; see benchmark_server.log")
+
+
+def send(url, clip, model):
+    """Upload one clip and return (latency seconds, error or None)"""
+    started = time.perf_counter()
+    try:
+        response = requests.post(
+            f"{url}/transcribe-file",
+            files={'audio': (clip['name'], clip['data'])},
+            data={'model': model} if model else None,
+            timeout=600
+        )
+        latency = time.perf_counter() - started
+        if response.status_code != 200:
+            return latency, f"HTTP {response.status_code}"
+        return latency, None
+    except requests.exceptions.RequestException as e:
+        return time.perf_counter() - started, type(e).__name__
+
+
+def run_level(url, corpus, concurrency, total_requests, model, pid, seed):
+    """Send ``total_requests`` uploads with ``concurrency`` in flight and summarize them"""
+    order = random.Random(seed + concurrency)
+    clips = [order.choice(corpus) for _ in range(total_requests)]
+    with MemorySampler(pid) as memory:
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            outcomes = list(pool.map(lambda clip: send(url, clip, model), clips))
+        wall = time.perf_counter() - started
+
+    ok = [(clip, latency) for clip, (latency, error) in zip(clips, outcomes) if error is None]
+    errors = {}
+    for _, error in outcomes:
+        if error is not None:
+            errors[error] = errors.get(error, 0) + 1
+    latencies = np.array([latency for _, latency in ok]) if ok else np.array([np.nan])
+    audio_seconds = sum(clip['seconds'] for clip, _ in ok)
+    by_format = {}
+    for clip, latency in ok:
+        by_format.setdefault(clip['format'], []).append(latency)
+    return {
+        'concurrency': concurrency,
+        'requests': total_requests,
+        'succeeded': len(ok),
+        'errors': errors,
+        'wall_seconds': round(wall, 3),
+        'throughput_rps': round(len(ok) / wall, 3),
+        'audio_seconds_per_second': round(audio_seconds / wall, 3),
+        'latency_p50': round(float(np.percentile(latencies, 50)), 4),
+        'latency_p95': round(float(np.percentile(latencies, 95)), 4),
+        'latency_p99': round(float(np.percentile(latencies, 99)), 4),
+        'latency_mean': round(float(np.mean(latencies)), 4),
+        # Client-observed: request seconds per second of audio, queueing included
+        'real_time_factor': round(float(np.sum(latencies)) / audio_seconds, 4) if audio_seconds else None,
+        'p50_by_format': {fmt: round(float(np.percentile(v, 50)), 4) for fmt, v in sorted(by_format.items())},
+        'peak_rss_mb': round(memory.peak / (1024 * 1024), 1) if memory.peak else None,
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BACKEND_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_levels(levels):
+    print(f"\n{'conc':>5}{'ok':>6}{'err':>5}{'rps':>8}{'p50 s':>9}{'p95 s':>9}{'p99 s':>9}{'RTF':>8}{'peak MB':>9}")
+    for level in levels:
+        peak = f"{level['peak_rss_mb']:.0f}" if level['peak_rss_mb'] else '-'
+        rtf = f"{level['real_time_factor']:.3f}" if level['real_time_factor'] is not None else '-'
+        print(f"{level['concurrency']:>5}{level['succeeded']:>6}{sum(level['errors'].values()):>5}"
+              f"{level['throughput_rps']:>8.2f}{level['latency_p50']:>9.3f}{level['latency_p95']:>9.3f}"
+              f"{level['latency_p99']:>9.3f}{rtf:>8}{peak:>9}")
+
+
+def print_comparison(baseline, levels):
+    """Relative change of the headline numbers against a previous run, per concurrency level"""
+    previous = {level['concurrency']: level for level in baseline['levels']}
+    print(f"\n📊 Compared with {baseline['meta'].get('git_commit') or 'baseline'} "
+          f"({baseline['meta'].get('timestamp')}):")
+    for level in levels:
+        old = previous.get(level['concurrency'])
+        if old is None:
+            continue
+        changes = []
+        for key in ('latency_p50', 'latency_p95', 'latency_p99', 'throughput_rps', 'peak_rss_mb'):
+            if old.get(key) and level.get(key) is not None:
+                changes.append(f"{key} {(level[key] - old[key]) / old[key] * 100:+.1f}%")
+        print(f"  concurrency {level['concurrency']}: " + ', '.join(changes))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--url', help='Benchmark an already running server instead of launching one')
+    parser.add_argument('--pid', type=int, help='PID of the running server, for peak memory with --url')
+    parser.add_argument('--engine', choices=['fake', 'real'], default='fake',
+                        help='Launched server uses the fake latency-simulating engine or real Whisper')
+    parser.add_argument('--server', choices=['dev', 'production'], default='dev',
+                        help='Launch the Flask development server or the gunicorn production server')
+    parser.add_argument('--port', type=int, default=5099)
+    parser.add_argument('--fake-rtf', type=float, default=0.15, help='Seconds of fake inference per audio second')
+    parser.add_argument('--fake-overhead-ms', type=float, default=50, help='Fixed fake inference cost per request')
+    parser.add_argument('--concurrency', default='1,4,8', help='Comma-separated concurrency levels')
+    parser.add_argument('--requests', type=int, default=32, help='Requests per concurrency level')
+    parser.add_argument('--warmup', type=int, default=2, help='Unmeasured requests before the first level')
+    parser.add_argument('--lengths', default='2,5,10,30,60', help='Comma-separated clip lengths in seconds')
+    parser.add_argument('--formats', default='wav,webm,mp4', help='Comma-separated clip formats')
+    parser.add_argument('--model', help='Model to request (server default if omitted)')
+    parser.add_argument('--seed', type=int, default=1234)
+    parser.add_argument('--startup-timeout', type=float, default=300)
+    parser.add_argument('--output', default='benchmark_results.json', help='Where to write the JSON results')
+    parser.add_argument('--compare', help='Previous results JSON to compare against')
+    args = parser.parse_args()
+
+    lengths = [float(x) for x in args.lengths.split(',')]
+    print("🏁 Speech-to-Text Backend Benchmark")
+    print("=" * 60)
+    corpus = build_corpus(lengths, args.formats.split(','), args.seed)
+    print(f"🎧 Corpus: {len(corpus)} clips ({', '.join(sorted({c['format'] for c in corpus}))}; "
+          f"{', '.join(f'{s:g}s' for s in lengths)})")
+
+    process = None
+    if args.url:
+        url, pid = args.url.rstrip('/'), args.pid
+    else:
+        print(f"🚀 Launching {args.server} server with the {args.engine} engine...")
+        process, url = launch_server(args)
+        pid = process.pid
+
+    try:
+        for clip in corpus[:args.warmup]:
+            send(url, clip, args.model)
+        levels = []
+        for concurrency in [int(x) for x in args.concurrency.split(',')]:
+            print(f"⏱️  Concurrency {concurrency}: {args.requests} requests...")
+            levels.append(run_level(url, corpus, concurrency, args.requests, args.model, pid, args.seed))
+        server_health = requests.get(f"{url}/health", timeout=10).json()
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait(timeout=30)
+
+    print_levels(levels)
+    results = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'engine': args.engine if not args.url else 'external',
+            'server': args.server if not args.url else args.url,
+            'fake_rtf': args.fake_rtf if args.engine == 'fake' and not args.url else None,
+            'seed': args.seed,
+            'corpus': [dict(name=c['name'], format=c['format'], seconds=c['seconds'], bytes=len(c['data']))
+                       for c in corpus],
+            'server_inference': server_health.get('inference'),
+        },
+        'levels': levels,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(results, f, indent=2)
+    print(f"\n💾 Results written to {args.output}")
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            print_comparison(json.load(f), levels)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Content-addressed transcription cache
+
+Results are keyed by a hash of the audio bytes together with the model name
+and decoding options, so re-uploading the same clip returns the stored
+transcription without running Whisper. Lookups go to an in-memory LRU first
+and then to a SQLite file that survives restarts. Both tiers expire entries
+after ``ttl_seconds``; the memory tier is bounded by entry count and the disk
+tier by total size, evicting least recently used entries first.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+
+def cache_key(data, model_name, options=None):
+    """Hash audio bytes with the model name and decoding options"""
+    return digest_cache_key(hashlib.sha256(data).hexdigest(), model_name, options)
+
+
+def digest_cache_key(digest, model_name, options=None):
+    """Cache key for audio whose SHA-256 hex digest was computed while it streamed in"""
+    settings = json.dumps({'model': model_name, 'options': options or {}}, sort_keys=True)
+    return f"{digest}:{hashlib.sha256(settings.encode()).hexdigest()[:16]}"
+
+
+class TranscriptionCache:
+    """Two-tier (memory LRU + SQLite) cache of transcription results"""
+
+    def __init__(self, memory_entries=256, disk_path=None, disk_max_mb=256, ttl_seconds=7 * 24 * 3600):
+        self.memory_entries = memory_entries
+        self.disk_path = disk_path
+        self.disk_max_bytes = int(disk_max_mb * 1024 * 1024)
+        self.ttl_seconds = ttl_seconds
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.evictions = 0
+        self._memory = OrderedDict()
+        self._lock = threading.Lock()
+        self._db = None
+        if disk_path:
+            directory = os.path.dirname(os.path.abspath(disk_path))
+            os.makedirs(directory, exist_ok=True)
+            self._db = sqlite3.connect(disk_path, check_same_thread=False)
+            self._db.execute(
+                'CREATE TABLE IF NOT EXISTS transcriptions ('
+                'key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL, '
+                'created REAL NOT NULL, last_access REAL NOT NULL)'
+            )
+            self._db.execute('CREATE INDEX IF NOT EXISTS idx_last_access ON transcriptions (last_access)')
+            self._db.commit()
+            self._purge_expired()
+
+    def get(self, key):
+        """Return the cached result for ``key`` or None"""
+        now = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                stored_at, value = entry
+                if now - stored_at <= self.ttl_seconds:
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return value
+                del self._memory[key]
+
+            if self._db is not None:
+                row = self._db.execute(
+                    'SELECT value, created FROM transcriptions WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and now - row[1] <= self.ttl_seconds:
+                    self._db.execute('UPDATE transcriptions SET last_access = ? WHERE key = ?', (now, key))
+                    self._db.commit()
+                    value = json.loads(row[0])
+                    self._remember(key, value, row[1])
+                    self.disk_hits += 1
+                    return value
+
+            self.misses += 1
+            return None
+
+    def put(self, key, value):
+        """Store a JSON-serializable result in both tiers"""
+        now = time.time()
+        with self._lock:
+            self._remember(key, value, now)
+            self.stores += 1
+            if self._db is not None:
+                payload = json.dumps(value)
+                self._db.execute(
+                    'INSERT OR REPLACE INTO transcriptions (key, value, size, created, last_access) '
+                    'VALUES (?, ?, ?, ?, ?)',
+                    (key, payload, len(payload), now, now)
+                )
+                self._evict_disk()
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            disk_entries, disk_bytes = 0, 0
+            if self._db is not None:
+                disk_entries, disk_bytes = self._db.execute(
+                    'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM transcriptions'
+                ).fetchone()
+            return {
+                'memory_entries': len(self._memory),
+                'disk_entries': disk_entries,
+                'disk_bytes': disk_bytes,
+                'memory_hits': self.memory_hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'stores': self.stores,
+                'evictions': self.evictions,
+                'hit_rate': round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+            }
+
+    def _remember(self, key, value, stored_at):
+        self._memory[key] = (stored_at, value)
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_entries:
+            self._memory.popitem(last=False)
+            self.evictions += 1
+
+    def _evict_disk(self):
+        total = self._db.execute('SELECT COALESCE(SUM(size), 0) FROM transcriptions').fetchone()[0]
+        if total <= self.disk_max_bytes:
+            return
+        rows = self._db.execute('SELECT key, size FROM transcriptions ORDER BY last_access').fetchall()
+        for key, size in rows:
+            if total <= self.disk_max_bytes:
+                break
+            self._db.execute('DELETE FROM transcriptions WHERE key = ?', (key,))
+            total -= size
+            self.evictions += 1
+
+    def _purge_expired(self):
+        with self._lock:
+            cursor = self._db.execute(
+                'DELETE FROM transcriptions WHERE created < ?', (time.time() - self.ttl_seconds,)
+            )
+            self.evictions += cursor.rowcount
+            self._db.commit()
@@ -0,0 +1,142 @@
+"""
+Parallel chunked transcription for long recordings
+
+Long audio is split into chunks that each fit a single 30-second Whisper
+window, preferring the quietest point near each boundary so words are not cut.
+When no pause can be found, the chunks overlap slightly and the duplicated
+words are removed when the results are stitched back together. Chunks run
+concurrently across the inference workers, but only as many are queued at a
+time as there are workers, so one long recording cannot fill the shared
+inference queue and turn other requests (or its own later chunks) away.
+"""
+
+import re
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, wait
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+from vad import frame_features
+
+
+def split_at_silence(audio, sample_rate=SAMPLE_RATE, chunk_seconds=28.0, search_seconds=6.0,
+                     overlap_seconds=1.0, silence_db=-40.0, frame_ms=30):
+    """Return (start, end) sample ranges covering ``audio`` in chunks of at most ``chunk_seconds``"""
+    chunk = int(chunk_seconds * sample_rate)
+    if len(audio) <= chunk:
+        return [(0, len(audio))]
+
+    frame = int(sample_rate * frame_ms / 1000)
+    energy_db, _ = frame_features(audio, frame)
+    search_frames = int(search_seconds * sample_rate) // frame
+    overlap = int(overlap_seconds * sample_rate)
+
+    ranges = []
+    start = 0
+    while len(audio) - start > chunk:
+        # Quietest frame in the last search_seconds of this chunk
+        last_frame = (start + chunk) // frame
+        first_frame = max(start // frame + 1, last_frame - search_frames)
+        window = energy_db[first_frame:last_frame]
+        quietest = first_frame + int(np.argmin(window))
+        if window[quietest - first_frame] <= silence_db:
+            cut = quietest * frame + frame // 2
+            ranges.append((start, cut))
+            start = cut
+        else:
+            # No pause to cut at: cut hard and overlap the next chunk so no word is lost
+            end = start + chunk
+            ranges.append((start, end))
+            start = end - overlap
+    ranges.append((start, len(audio)))
+    return ranges
+
+
+def _normalize(word):
+    return re.sub(r'[^\w]', '', word.lower())
+
+
+def _drop_repeated_words(previous_text, text, max_words=8):
+    """Remove words at the start of ``text`` that repeat the end of ``previous_text``"""
+    previous = [_normalize(w) for w in previous_text.split()]
+    words = text.split()
+    current = [_normalize(w) for w in words]
+    for k in range(min(max_words, len(previous), len(current)), 0, -1):
+        if previous[-k:] == current[:k]:
+            return ' '.join(words[k:])
+    return text
+
+
+def _overlap_midpoint(earlier, later, sample_rate):
+    """Midpoint of two overlapping chunk ranges in seconds, or None if they do not overlap"""
+    if later[0] >= earlier[1]:
+        return None
+    return (later[0] + earlier[1]) / 2.0 / sample_rate
+
+
+def stitch(ranges, results, sample_rate=SAMPLE_RATE):
+    """Join per-chunk results in order, shifting timestamps and resolving overlaps"""
+    segments = []
+    for i, ((start, end), result) in enumerate(zip(ranges, results)):
+        offset = start / float(sample_rate)
+        # Inside an overlap, segments belong to the chunk whose half they start in
+        after = _overlap_midpoint(ranges[i - 1], ranges[i], sample_rate) if i > 0 else None
+        before = _overlap_midpoint(ranges[i], ranges[i + 1], sample_rate) if i + 1 < len(ranges) else None
+
+        chunk_segments = result['segments'] or [
+            {'start': 0.0, 'end': (end - start) / float(sample_rate), 'text': result['text']}
+        ]
+        for segment in chunk_segments:
+            seg_start = segment['start'] + offset
+            seg_end = segment['end'] + offset
+            if before is not None and seg_start >= before:
+                continue
+            if after is not None and seg_end <= after:
+                continue
+            text = segment['text'].strip()
+            if after is not None and seg_start < after and segments:
+                text = _drop_repeated_words(segments[-1]['text'], text)
+            if text:
+                segments.append({'start': seg_start, 'end': seg_end, 'text': text})
+
+    languages = Counter(r['language'] for r in results if r.get('language') not in (None, 'unknown'))
+    return {
+        'text': ' '.join(s['text'] for s in segments).strip(),
+        'language': languages.most_common(1)[0][0] if languages else 'unknown',
+        'segments': segments,
+        'chunks': len(ranges),
+        'retries': sum(r.get('retries', 0) for r in results),
+        'mock': any(r.get('mock') for r in results),
+    }
+
+
+def transcribe_long(submit, model_name, audio, options=None, timeout=None, max_in_flight=None, **split_options):
+    """Split ``audio``, transcribe the chunks concurrently via ``submit`` and stitch the results
+
+    At most ``max_in_flight`` chunks (default: all) are submitted at a time;
+    the next one goes in as soon as one finishes. ``timeout`` bounds the wait
+    for each chunk. If a chunk fails or cannot be queued, the chunks not yet
+    started are cancelled and the error is raised.
+    """
+    ranges = split_at_silence(audio, **split_options)
+    limit = max(1, max_in_flight or len(ranges))
+    results = [None] * len(ranges)
+    pending = {}
+    next_chunk = 0
+    try:
+        while next_chunk < len(ranges) or pending:
+            while next_chunk < len(ranges) and len(pending) < limit:
+                start, end = ranges[next_chunk]
+                pending[submit(model_name, audio[start:end], options)] = next_chunk
+                next_chunk += 1
+            done, _ = wait(pending, timeout=timeout, return_when=FIRST_COMPLETED)
+            if not done:
+                raise TimeoutError(f"No chunk of the recording finished within {timeout}s")
+            for future in done:
+                results[pending.pop(future)] = future.result()
+    finally:
+        # Only reached with work left on failure: drop chunks that have not started
+        for future in pending:
+            future.cancel()
+    return stitch(ranges, results)
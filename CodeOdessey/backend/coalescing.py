@@ -0,0 +1,64 @@
+"""
+In-flight request coalescing
+
+Client retries and double-clicks often submit the same clip again while its
+first transcription is still running. Requests are keyed by a hash of their
+audio (plus model and decoding options); the first request for a key runs
+the computation, and any identical request arriving before it finishes waits
+for that result instead of queueing a second inference. Once the result is
+in, the key is released, and the transcription cache answers later repeats.
+"""
+
+import threading
+from concurrent.futures import Future
+
+
+class RequestCoalescer:
+    """Runs at most one computation per key at a time; concurrent callers share its result or error"""
+
+    def __init__(self):
+        self.leaders = 0
+        self.coalesced = 0
+        self._in_flight = {}
+        self._lock = threading.Lock()
+
+    def run(self, key, fn, *args):
+        """Return ``(fn(*args), coalesced)``, joining a running call with the same key if there is one
+
+        ``coalesced`` is True when the result came from another caller's
+        computation. ``fn`` must not itself call ``run`` with the same key.
+        """
+        with self._lock:
+            future = self._in_flight.get(key)
+            if future is None:
+                future = self._in_flight[key] = Future()
+                self.leaders += 1
+                leader = True
+            else:
+                self.coalesced += 1
+                leader = False
+        if not leader:
+            return future.result(), True
+
+        try:
+            result = fn(*args)
+        except BaseException as e:
+            future.set_exception(e)
+            raise
+        else:
+            future.set_result(result)
+            return result, False
+        finally:
+            with self._lock:
+                del self._in_flight[key]
+
+    def status(self):
+        with self._lock:
+            in_flight = len(self._in_flight)
+        total = self.leaders + self.coalesced
+        return {
+            'in_flight': in_flight,
+            'computed': self.leaders,
+            'coalesced': self.coalesced,
+            'coalesced_ratio': round(self.coalesced / total, 4) if total else 0.0,
+        }
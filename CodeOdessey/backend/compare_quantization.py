@@ -0,0 +1,171 @@
+#!/usr/bin/env python3
+"""
+Compare fp32 and int8-quantized Whisper inference on a fixed set of local clips
+
+Each clip is an audio file with a reference transcript next to it (same name,
+.txt extension). Every precision runs in its own subprocess so peak memory is
+measured in isolation. Reports real-time factor, peak RSS and word error rate.
+
+Usage:
+    python compare_quantization.py --clips ./eval_clips --model small
+    python compare_quantization.py --clips ./eval_clips --output quantization_report.json
+"""
+
+import argparse
+import glob
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import time
+
+AUDIO_EXTENSIONS = ('.wav', '.webm', '.mp3', '.mp4', '.m4a', '.ogg', '.flac')
+
+
+def normalize_words(text):
+    """Lowercase, strip punctuation and split into words"""
+    return re.sub(r"[^\w\s']", ' ', text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level Levenshtein distance between two transcripts"""
+    ref = normalize_words(reference)
+    hyp = normalize_words(hypothesis)
+    previous = list(range(len(hyp) + 1))
+    for i, ref_word in enumerate(ref, 1):
+        current = [i] + [0] * len(hyp)
+        for j, hyp_word in enumerate(hyp, 1):
+            current[j] = min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (ref_word != hyp_word)
+            )
+        previous = current
+    return previous[-1], len(ref)
+
+
+def find_clips(directory):
+    clips = []
+    for path in sorted(glob.glob(os.path.join(directory, '*'))):
+        base, extension = os.path.splitext(path)
+        if extension.lower() in AUDIO_EXTENSIONS and os.path.exists(base + '.txt'):
+            clips.append((path, base + '.txt'))
+    return clips
+
+
+def peak_rss_mb():
+    """Peak resident set size of this process in MB"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and kilobytes on Linux
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+def run_precision(model_name, precision, clips):
+    """Transcribe every clip with one precision; runs inside a dedicated subprocess"""
+    from audio_io import decode_audio_bytes, duration_seconds
+    from model_registry import ModelRegistry
+
+    registry = ModelRegistry(default_model=model_name, device='cpu', default_precision=precision)
+    started = time.time()
+    model = registry.get()
+    load_seconds = time.time() - started
+    if registry.is_mock():
+        raise SystemExit("Whisper is not available; install the backend requirements first")
+
+    audio_seconds = 0.0
+    inference_seconds = 0.0
+    errors = 0
+    reference_words = 0
+    per_clip = []
+    for audio_path, reference_path in clips:
+        with open(audio_path, 'rb') as f:
+            audio = decode_audio_bytes(f.read())
+        with open(reference_path, encoding='utf-8') as f:
+            reference = f.read()
+
+        started = time.time()
+        result = model.transcribe(audio, fp16=False, temperature=0.0)
+        elapsed = time.time() - started
+
+        clip_errors, clip_words = word_errors(reference, result['text'])
+        audio_seconds += duration_seconds(audio)
+        inference_seconds += elapsed
+        errors += clip_errors
+        reference_words += clip_words
+        per_clip.append({
+            'clip': os.path.basename(audio_path),
+            'seconds': round(duration_seconds(audio), 2),
+            'rtf': round(elapsed / max(duration_seconds(audio), 1e-6), 3),
+            'wer': round(clip_errors / max(clip_words, 1), 4),
+            'text': result['text'].strip(),
+        })
+
+    return {
+        'precision': precision,
+        'model': model_name,
+        'clips': len(clips),
+        'audio_seconds': round(audio_seconds, 2),
+        'load_seconds': round(load_seconds, 2),
+        'model_size_mb': round(registry.resident_mb(), 1),
+        'rtf': round(inference_seconds / max(audio_seconds, 1e-6), 3),
+        'peak_rss_mb': round(peak_rss_mb(), 1),
+        'wer': round(errors / max(reference_words, 1), 4),
+        'per_clip': per_clip,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clips', required=True, help='Directory of audio clips with matching .txt references')
+    parser.add_argument('--model', default=os.environ.get('WHISPER_MODEL', 'small'), help='Whisper model name')
+    parser.add_argument('--precisions', default='fp32,int8', help='Comma-separated precisions to compare')
+    parser.add_argument('--output', help='Write the full report as JSON to this file')
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    clips = find_clips(args.clips)
+    if not clips:
+        print(f"❌ No clips with matching .txt references found in {args.clips}")
+        sys.exit(1)
+
+    if args.worker:
+        print(json.dumps(run_precision(args.model, args.worker, clips)))
+        return
+
+    print(f"🔬 Comparing {args.precisions} for Whisper '{args.model}' on {len(clips)} clips")
+    print("=" * 60)
+    reports = []
+    for precision in args.precisions.split(','):
+        print(f"⏳ Running {precision}...")
+        output = subprocess.run(
+            [sys.executable, os.path.abspath(__file__), '--clips', args.clips, '--model', args.model,
+             '--worker', precision],
+            capture_output=True, text=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        )
+        if output.returncode != 0:
+            print(f"❌ {precision} run failed:\n{output.stderr or output.stdout}")
+            sys.exit(1)
+        # The report is the last line; model loading may print before it
+        reports.append(json.loads(output.stdout.strip().splitlines()[-1]))
+
+    print(f"\n{'precision':<10}{'RTF':>8}{'peak MB':>10}{'model MB':>10}{'WER':>8}")
+    for report in reports:
+        print(f"{report['precision']:<10}{report['rtf']:>8.3f}{report['peak_rss_mb']:>10.0f}"
+              f"{report['model_size_mb']:>10.0f}{report['wer'] * 100:>7.1f}%")
+    if len(reports) > 1:
+        baseline, candidate = reports[0], reports[-1]
+        print(f"\n📊 {candidate['precision']} vs {baseline['precision']}: "
+              f"{baseline['rtf'] / max(candidate['rtf'], 1e-6):.2f}x speed, "
+              f"{candidate['peak_rss_mb'] - baseline['peak_rss_mb']:+.0f} MB peak memory, "
+              f"{(candidate['wer'] - baseline['wer']) * 100:+.1f} pts WER")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({'model': args.model, 'reports': reports}, f, indent=2)
+        print(f"\n💾 Report written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -12,14 +12,106 @@ class Config:
     DEBUG = os.environ.get('FLASK_DEBUG', '1') == '1'
     HOST = os.environ.get('FLASK_HOST', '0.0.0.0')
     PORT = int(os.environ.get('FLASK_PORT', 5000))
+    # The reloader restarts the process (and reloads every model) on each code change
+    USE_RELOADER = os.environ.get('FLASK_RELOADER', '0') == '1'
     
     # Whisper model settings
     WHISPER_MODEL = os.environ.get('WHISPER_MODEL', 'small')
+    WHISPER_MODELS = os.environ.get('WHISPER_MODELS', 'tiny,tiny.en,base,base.en,small,small.en').split(',')
+    MODEL_MEMORY_BUDGET_MB = int(os.environ.get('MODEL_MEMORY_BUDGET_MB', 2048))
+    # fp32, or int8 for dynamically quantized linear layers on CPU-only hosts
+    WHISPER_PRECISION = os.environ.get('WHISPER_PRECISION', 'fp32')
+    # Decoding profile used when a request does not pick one, and the profiles clients may pick
+    DECODING_PROFILE = os.environ.get('DECODING_PROFILE', 'interactive')
+    DECODING_PROFILES = os.environ.get('DECODING_PROFILES', 'interactive,archival').split(',')
+    
+    # Language hints: English audio goes to an English-only model (ENGLISH_MODEL, or the
+    # ".en" sibling of the requested model), and detected languages are remembered per session
+    ENGLISH_MODEL_ROUTING = os.environ.get('ENGLISH_MODEL_ROUTING', '1') == '1'
+    ENGLISH_MODEL = os.environ.get('ENGLISH_MODEL', '')
+    LANGUAGE_MEMORY_SESSIONS = int(os.environ.get('LANGUAGE_MEMORY_SESSIONS', 10000))
+    LANGUAGE_MEMORY_TTL = int(os.environ.get('LANGUAGE_MEMORY_TTL', 3600))
+    
+    # Simulated engine for benchmarks without model weights: sleeps RTF x audio length per request
+    FAKE_ENGINE_RTF = float(os.environ['FAKE_ENGINE_RTF']) if os.environ.get('FAKE_ENGINE_RTF') else None
+    FAKE_ENGINE_OVERHEAD_MS = float(os.environ.get('FAKE_ENGINE_OVERHEAD_MS', 50))
+    # Run a short decode on synthetic audio after loading so the first request is not cold
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', '1') == '1'
+    
+    # Inference worker settings (0 workers runs inference inline in one thread)
+    INFERENCE_WORKERS = int(os.environ.get('INFERENCE_WORKERS', 2))
+    INFERENCE_QUEUE_SIZE = int(os.environ.get('INFERENCE_QUEUE_SIZE', 16))
+    INFERENCE_TORCH_THREADS = int(os.environ.get('INFERENCE_TORCH_THREADS', 0)) or max(1, (os.cpu_count() or 1) // max(INFERENCE_WORKERS, 1))
+    INFERENCE_TIMEOUT = int(os.environ.get('INFERENCE_TIMEOUT', 300))
+    
+    # CPU partitioning: '' leaves threading to INFERENCE_TORCH_THREADS, 'RxT' (e.g. '4x8') pins
+    # R replicas to T cores each, 'auto' picks R by a calibration run on the clip-length mix
+    CPU_LAYOUT = os.environ.get('CPU_LAYOUT', '')
+    CPU_CALIBRATION_CLIPS = [float(s) for s in os.environ.get('CPU_CALIBRATION_CLIPS', '5,15,30').split(',')]
+    CPU_CALIBRATION_FILE = os.environ.get('CPU_CALIBRATION_FILE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'cpu_layout.json'))
+    CPU_MAX_REPLICAS = int(os.environ.get('CPU_MAX_REPLICAS', 8))
+    CPU_INTEROP_THREADS = int(os.environ.get('CPU_INTEROP_THREADS', 1))
+    
+    # Inference queue order: 'sjf' runs the shortest estimated job first (interactive ahead of
+    # bulk, with aging so long jobs still progress), 'fifo' keeps arrival order
+    SCHEDULER_POLICY = os.environ.get('SCHEDULER_POLICY', 'sjf')
+    SCHEDULER_AGING_RATE = float(os.environ.get('SCHEDULER_AGING_RATE', 1.0))
+    SCHEDULER_BULK_DELAY = float(os.environ.get('SCHEDULER_BULK_DELAY', 30))
+    
+    # Micro-batching of concurrent requests (a max size of 1 disables batching)
+    BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 8))
+    BATCH_MAX_WAIT_MS = int(os.environ.get('BATCH_MAX_WAIT_MS', 20))
+    
+    # Upload limits: larger or longer uploads are rejected with 413 as soon as the limit is crossed
+    MAX_UPLOAD_BYTES = int(float(os.environ.get('MAX_UPLOAD_MB', 100)) * 1024 * 1024)
+    MAX_UPLOAD_SECONDS = float(os.environ.get('MAX_UPLOAD_SECONDS', 3600))
+    UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_KB', 64)) * 1024
+    
+    # Multi-file /transcribe-batch uploads: files per request and files transcribed at once
+    BATCH_UPLOAD_MAX_FILES = int(os.environ.get('BATCH_UPLOAD_MAX_FILES', 50))
+    BATCH_UPLOAD_CONCURRENCY = int(os.environ.get('BATCH_UPLOAD_CONCURRENCY', 8))
     
     # Audio settings
     AUDIO_SAMPLE_RATE = int(os.environ.get('AUDIO_SAMPLE_RATE', 16000))
     AUDIO_CHANNELS = int(os.environ.get('AUDIO_CHANNELS', 1))
     
+    # Long recordings are split at pauses and the chunks transcribed in parallel
+    LONG_AUDIO_CHUNKING = os.environ.get('LONG_AUDIO_CHUNKING', '1') == '1'
+    LONG_AUDIO_CHUNK_SECONDS = float(os.environ.get('LONG_AUDIO_CHUNK_SECONDS', 28.0))
+    
+    # Transcription cache (memory LRU plus an on-disk SQLite tier; empty path disables the disk tier)
+    CACHE_ENABLED = os.environ.get('CACHE_ENABLED', '1') == '1'
+    CACHE_MEMORY_ENTRIES = int(os.environ.get('CACHE_MEMORY_ENTRIES', 256))
+    CACHE_DISK_PATH = os.environ.get('CACHE_DISK_PATH', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cache', 'transcriptions.sqlite3'))
+    CACHE_DISK_MAX_MB = int(os.environ.get('CACHE_DISK_MAX_MB', 256))
+    CACHE_TTL_SECONDS = int(os.environ.get('CACHE_TTL_SECONDS', 7 * 24 * 3600))
+    # Identical requests arriving while the first is still transcribing share its result
+    COALESCE_REQUESTS = os.environ.get('COALESCE_REQUESTS', '1') == '1'
+    
+    # Asynchronous job API and load shedding
+    JOB_MAX_QUEUED = int(os.environ.get('JOB_MAX_QUEUED', 64))
+    JOB_MAX_DRAIN_SECONDS = float(os.environ.get('JOB_MAX_DRAIN_SECONDS', 120))
+    JOB_INITIAL_RTF = float(os.environ.get('JOB_INITIAL_RTF', 0.5))
+    JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 600))
+    JOB_MAX_WAIT_SECONDS = float(os.environ.get('JOB_MAX_WAIT_SECONDS', 30))
+    
+    # Voice-activity detection before transcription
+    VAD_ENABLED = os.environ.get('VAD_ENABLED', '1') == '1'
+    VAD_MARGIN_DB = float(os.environ.get('VAD_MARGIN_DB', 10.0))
+    VAD_PADDING_MS = int(os.environ.get('VAD_PADDING_MS', 200))
+    
+    # Recording session settings
+    RECORDING_MAX_SESSIONS = int(os.environ.get('RECORDING_MAX_SESSIONS', 8))
+    RECORDING_IDLE_TIMEOUT = int(os.environ.get('RECORDING_IDLE_TIMEOUT', 300))
+    # Capacity of each session's ring buffer; longer recordings keep their most recent audio
+    RECORDING_MAX_SECONDS = int(os.environ.get('RECORDING_MAX_SECONDS', 600))
+    
+    # Live streaming transcription settings
+    STREAM_MAX_SESSIONS = int(os.environ.get('STREAM_MAX_SESSIONS', 8))
+    STREAM_IDLE_TIMEOUT = int(os.environ.get('STREAM_IDLE_TIMEOUT', 60))
+    STREAM_STEP_SECONDS = float(os.environ.get('STREAM_STEP_SECONDS', 1.0))
+    STREAM_MAX_WINDOW_SECONDS = float(os.environ.get('STREAM_MAX_WINDOW_SECONDS', 20.0))
+    
     # CORS settings
     CORS_ORIGINS = os.environ.get('CORS_ORIGINS', 'http://localhost:3000,http://127.0.0.1:3000').split(',')
     
@@ -31,8 +123,22 @@ class DevelopmentConfig(Config):
     DEBUG = True
 
 class ProductionConfig(Config):
-    """Production configuration"""
+    """Production configuration
+
+    Served by gunicorn (see gunicorn.conf.py): the model is loaded once in the
+    master and the forked server workers run inference inline on it, sharing
+    the weight pages copy-on-write.
+    """
     DEBUG = False
+    
+    # Pre-forked server workers, and threads per worker for concurrent uploads and polling
+    SERVER_WORKERS = int(os.environ.get('SERVER_WORKERS', 0)) or max(1, (os.cpu_count() or 1) // 2)
+    SERVER_THREADS = int(os.environ.get('SERVER_THREADS', 4))
+    SERVER_TIMEOUT = int(os.environ.get('SERVER_TIMEOUT', 300))
+    
+    # Each server worker is its own inference worker; its cores are split evenly among them
+    INFERENCE_WORKERS = 0
+    INFERENCE_TORCH_THREADS = int(os.environ.get('INFERENCE_TORCH_THREADS', 0)) or max(1, (os.cpu_count() or 1) // SERVER_WORKERS)
 
 config = {
     'development': DevelopmentConfig,
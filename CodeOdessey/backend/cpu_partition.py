@@ -0,0 +1,217 @@
+"""
+CPU core partitioning for model replicas
+
+Every PyTorch process sizes its thread pools to the whole machine by default,
+so two replicas transcribing at once oversubscribe the cores and latency
+becomes erratic. Here the available cores are split into disjoint sets, one
+per replica, and each replica is pinned to its set with matching intra-op and
+inter-op thread counts.
+
+How many replicas to run (many narrow ones for throughput on short clips, or
+a few wide ones for long recordings) depends on the model and the clip-length
+mix, so the split can be chosen by a calibration run at startup. The winner
+is cached on disk so later starts skip the calibration.
+"""
+
+import json
+import os
+import time
+
+
+def available_cpus():
+    """CPUs this process may run on (respects cgroup/taskset restrictions where visible)"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def parse_layout(value):
+    """Parse a CPU_LAYOUT value: '' (off), 'auto', or 'REPLICASxTHREADS' such as '4x8'"""
+    value = (value or '').strip().lower()
+    if value in ('', 'off', 'auto'):
+        return value or 'off'
+    try:
+        replicas, threads = (int(part) for part in value.split('x'))
+    except ValueError:
+        raise ValueError(f"Invalid CPU_LAYOUT '{value}'. Use 'auto', 'off' or e.g. '4x8'")
+    if replicas < 1 or threads < 1:
+        raise ValueError(f"Invalid CPU_LAYOUT '{value}': replicas and threads must be at least 1")
+    return replicas, threads
+
+
+def partition(cpus, replicas, threads=None):
+    """Split ``cpus`` into ``replicas`` contiguous sets of ``threads`` cores (default: an even split)
+
+    Contiguous ranges keep a replica's cores on the same socket and let
+    hyper-thread siblings (usually numbered apart) land in different replicas.
+    """
+    replicas = max(1, min(replicas, len(cpus)))
+    if threads is None:
+        base, extra = divmod(len(cpus), replicas)
+        sizes = [base + (1 if i < extra else 0) for i in range(replicas)]
+    else:
+        if replicas * threads > len(cpus):
+            raise ValueError(f"{replicas} replicas x {threads} threads needs {replicas * threads} CPUs, "
+                             f"only {len(cpus)} available")
+        sizes = [threads] * replicas
+    sets, start = [], 0
+    for size in sizes:
+        sets.append(list(cpus[start:start + size]))
+        start += size
+    return sets
+
+
+def candidate_replica_counts(n_cpus, max_replicas):
+    """Replica counts worth calibrating: powers of two (plus the core count) up to ``max_replicas``"""
+    counts, replicas = [], 1
+    limit = max(1, min(n_cpus, max_replicas))
+    while replicas <= limit:
+        counts.append(replicas)
+        replicas *= 2
+    if limit not in counts:
+        counts.append(limit)
+    return counts
+
+
+def pin_current_process(cpus, interop_threads=1):
+    """Pin this process to ``cpus`` and size PyTorch's thread pools to match
+
+    Call before the first parallel PyTorch operation: the inter-op pool can
+    only be sized once, and OpenMP reads its environment when it starts.
+    """
+    threads = str(len(cpus))
+    for name in ('OMP_NUM_THREADS', 'MKL_NUM_THREADS', 'OPENBLAS_NUM_THREADS'):
+        os.environ[name] = threads
+    if hasattr(os, 'sched_setaffinity'):
+        try:
+            os.sched_setaffinity(0, cpus)
+        except OSError as e:
+            print(f"Could not pin process {os.getpid()} to CPUs {cpus}: {e}")
+    try:
+        import torch
+        torch.set_num_threads(len(cpus))
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError:
+            # Already fixed by earlier parallel work in this process (e.g. a preloaded model)
+            pass
+    except ImportError:
+        pass
+
+
+def calibration_key(model_name, cpus, clip_seconds):
+    return f"{model_name}|{len(cpus)} cpus|clips {','.join(f'{s:g}' for s in clip_seconds)}"
+
+
+def load_calibration(path, key):
+    try:
+        with open(path) as f:
+            return json.load(f).get(key)
+    except (OSError, ValueError):
+        return None
+
+
+def save_calibration(path, key, result):
+    try:
+        try:
+            with open(path) as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            stored = {}
+        stored[key] = result
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'w') as f:
+            json.dump(stored, f, indent=2)
+    except OSError as e:
+        print(f"Could not save CPU calibration to {path}: {e}")
+
+
+def _calibration_audio(seconds, seed):
+    """Speech-band noise bursts with pauses: enough structure to exercise detection and decoding"""
+    import numpy as np
+    from audio_io import SAMPLE_RATE
+    rng = np.random.default_rng(seed)
+    samples = int(seconds * SAMPLE_RATE)
+    envelope = (np.sin(np.arange(samples) * 2 * np.pi * 0.7 / SAMPLE_RATE) > -0.3).astype(np.float32)
+    tone = np.sin(np.arange(samples) * 2 * np.pi * rng.uniform(120, 220) / SAMPLE_RATE)
+    return ((tone * 0.3 + rng.standard_normal(samples) * 0.05) * envelope).astype(np.float32)
+
+
+def measure_throughput(registry, cpu_sets, clip_seconds, options=None, rounds=2, interop_threads=1):
+    """Audio seconds transcribed per wall-clock second with one replica per CPU set
+
+    Each replica is kept busy with ``rounds`` clips of every length in the
+    mix, so the figure reflects sustained load rather than one request.
+    """
+    from inference import InferencePool
+
+    pool = InferencePool(registry, workers=len(cpu_sets), queue_size=len(cpu_sets) * rounds * len(clip_seconds),
+                         cpu_sets=cpu_sets, interop_threads=interop_threads)
+    try:
+        pool.start()
+        clips = [
+            _calibration_audio(seconds, seed)
+            for seed, seconds in enumerate(clip_seconds * (rounds * len(cpu_sets)))
+        ]
+        started = time.time()
+        model_name = registry.resolve(None, None)
+        futures = [pool.submit_transcription(model_name, clip, options) for clip in clips]
+        for future in futures:
+            future.result(timeout=pool.timeout)
+        elapsed = time.time() - started
+    finally:
+        pool.shutdown(wait=True)
+    return sum(clip_seconds) * rounds * len(cpu_sets) / elapsed
+
+
+def calibrate(registry, clip_seconds, max_replicas=8, options=None, interop_threads=1, cpus=None):
+    """Try each candidate replica count on the clip mix and return the fastest split
+
+    Returns a dict with the chosen ``replicas``, ``threads`` per replica and
+    the measured throughput of every candidate.
+    """
+    cpus = cpus or available_cpus()
+    results = {}
+    for replicas in candidate_replica_counts(len(cpus), max_replicas):
+        sets = partition(cpus, replicas)
+        print(f"CPU calibration: {replicas} replica(s) x {len(sets[0])} thread(s)...")
+        try:
+            results[replicas] = measure_throughput(registry, sets, clip_seconds, options,
+                                                   interop_threads=interop_threads)
+        except Exception as e:
+            # e.g. out of memory with too many replicas; keep the candidates that worked
+            print(f"CPU calibration with {replicas} replica(s) failed: {e}")
+            continue
+        print(f"CPU calibration: {replicas} replica(s) -> {results[replicas]:.2f} audio s/s")
+    if not results:
+        raise RuntimeError("CPU calibration failed for every layout")
+    best = max(results, key=results.get)
+    return {
+        'replicas': best,
+        'threads': len(cpus) // best,
+        'throughput': {str(r): round(t, 3) for r, t in results.items()},
+        'calibrated_at': time.time(),
+    }
+
+
+def resolve_layout(layout, registry, clip_seconds, calibration_file=None, max_replicas=8,
+                   options=None, interop_threads=1):
+    """CPU sets (one per replica) for a CPU_LAYOUT setting, running or reusing a calibration for 'auto'"""
+    layout = parse_layout(layout)
+    if layout == 'off':
+        return None
+    cpus = available_cpus()
+    if layout != 'auto':
+        replicas, threads = layout
+        return partition(cpus, replicas, threads)
+
+    key = calibration_key(registry.resolve(None, None), cpus, clip_seconds)
+    result = load_calibration(calibration_file, key) if calibration_file else None
+    if result is None:
+        result = calibrate(registry, clip_seconds, max_replicas, options, interop_threads, cpus)
+        if calibration_file:
+            save_calibration(calibration_file, key, result)
+    else:
+        print(f"Using cached CPU calibration for {key}")
+    print(f"CPU layout: {result['replicas']} replica(s) x {result['threads']} thread(s)")
+    return partition(cpus, result['replicas'], result['threads'])
@@ -0,0 +1,57 @@
+"""
+Named decoding profiles
+
+Whisper's defaults are tuned for offline accuracy: on a hard clip, beam search
+plus temperature fallback can re-decode a 30-second window up to six times.
+Profiles let each request choose between predictable latency ("interactive")
+and best accuracy ("archival") instead of always paying for the latter.
+"""
+
+# Temperatures Whisper falls back through when a decode looks like a failure
+FALLBACK_TEMPERATURES = (0.0, 0.2, 0.4, 0.6, 0.8, 1.0)
+
+PROFILES = {
+    # Greedy, single pass per window, no conditioning on earlier text (which can
+    # propagate hallucinations), output bounded per 30-second window
+    'interactive': {
+        'temperature': 0.0,
+        'condition_on_previous_text': False,
+        'sample_len': 160,
+    },
+    # Whisper's accuracy-oriented settings: beam search with temperature fallback
+    'archival': {
+        'temperature': FALLBACK_TEMPERATURES,
+        'beam_size': 5,
+        'best_of': 5,
+        'condition_on_previous_text': True,
+        'compression_ratio_threshold': 2.4,
+        'logprob_threshold': -1.0,
+    },
+}
+
+
+def profile_options(name, allowed=None):
+    """Decoding options for a profile name, validated against the ``allowed`` profile names"""
+    if name not in PROFILES or (allowed is not None and name not in allowed):
+        available = [p for p in PROFILES if allowed is None or p in allowed]
+        raise ValueError(f"Unknown decoding profile '{name}'. Available: {', '.join(available)}")
+    return dict(PROFILES[name])
+
+
+def is_batchable(options):
+    """Whether options can run through the batched greedy decoder (no beam search or fallback)"""
+    options = options or {}
+    return not isinstance(options.get('temperature', 0.0), (list, tuple)) and not options.get('beam_size')
+
+
+def count_retries(segments, temperature=0.0):
+    """Temperature fallbacks taken by a transcription, summed over its 30-second windows
+
+    Whisper records the temperature of the accepted decode on every segment;
+    each step past the first temperature is one full re-decode of the window.
+    """
+    temperatures = tuple(temperature) if isinstance(temperature, (list, tuple)) else (temperature,)
+    accepted = {}
+    for segment in segments:
+        accepted[segment.get('seek')] = segment.get('temperature', temperatures[0])
+    return sum(temperatures.index(t) if t in temperatures else 0 for t in accepted.values())
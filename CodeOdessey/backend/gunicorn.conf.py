@@ -0,0 +1,59 @@
+"""
+Gunicorn settings for production serving
+
+    gunicorn -c gunicorn.conf.py app:app
+
+The app (and the default Whisper model) is loaded once in the master before
+workers are forked, so all workers share the model weights copy-on-write and
+resident memory grows far slower than one full model per worker. Each worker
+then runs inference inline with its share of the CPU cores. With CPU_LAYOUT
+set, the worker count comes from the layout (calibrated on first start for
+'auto') and every worker is pinned to its own set of cores.
+"""
+
+import gc
+import os
+
+os.environ.setdefault('FLASK_ENV', 'production')
+
+# Module-level names are read as gunicorn settings, so avoid clashing with "config"
+import config as backend_config
+import cpu_partition
+
+settings = backend_config.config[os.environ['FLASK_ENV']]
+
+# One CPU set per worker, or None to leave threading to INFERENCE_TORCH_THREADS
+cpu_sets = None
+if cpu_partition.parse_layout(settings.CPU_LAYOUT) != 'off':
+    import app as backend_app
+    cpu_sets = backend_app.resolve_cpu_sets()
+
+bind = f"{settings.HOST}:{settings.PORT}"
+workers = len(cpu_sets) if cpu_sets else getattr(settings, 'SERVER_WORKERS', 1)
+threads = getattr(settings, 'SERVER_THREADS', 4)
+worker_class = 'gthread'
+timeout = getattr(settings, 'SERVER_TIMEOUT', 300)
+preload_app = True
+
+
+def when_ready(server):
+    import app
+    app.preload_models()
+    # Move everything loaded so far out of the collector's reach, so garbage
+    # collection in the workers does not write to (and copy) shared pages
+    gc.freeze()
+    server.log.info("Model preloaded; forking %s worker(s)", workers)
+
+
+def pre_fork(server, worker):
+    # A replacement worker takes over the CPU set no live worker holds
+    if cpu_sets:
+        taken = {getattr(w, 'cpu_slot', None) for w in server.WORKERS.values()}
+        worker.cpu_slot = next(i for i in range(len(cpu_sets)) if i not in taken)
+
+
+def post_fork(server, worker):
+    import app
+    if cpu_sets:
+        app.pin_forked_worker(cpu_sets[worker.cpu_slot])
+    app.init_forked_worker()
@@ -0,0 +1,582 @@
+"""
+Inference worker pool for Whisper transcription
+
+Flask request threads never touch a model directly. They submit work to a
+bounded queue and wait on a future; a dispatcher thread hands queued work to a
+fixed number of inference workers as they become free. Each worker is a
+separate process with its own model registry, so concurrent transcriptions run
+on separate model replicas instead of contending for one set of PyTorch
+intra-op threads. Queued work is ordered by scheduling.PriorityJobQueue, so
+short and interactive transcriptions are not stuck behind long uploads.
+"""
+
+import multiprocessing
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor
+
+from audio_io import SAMPLE_RATE
+from cpu_partition import pin_current_process
+from decoding import count_retries
+from frontend import EncoderMemo, log_mel_batch
+from metrics import process_rss_bytes
+from model_registry import ModelRegistry, MockWhisperModel, is_simulated
+from scheduling import PriorityJobQueue, WaitStats, normalize_priority
+
+
+class QueueFullError(Exception):
+    """Raised when the inference queue cannot accept more work"""
+
+
+# Per-worker state, populated by _worker_init inside each worker
+_registry = None
+
+
+_warmup_seconds = None
+_cpus = None
+
+# Stage timings of the task currently running in this worker; a worker runs one
+# task at a time, so the hooks installed by _instrument can add to it directly
+_stages = None
+_detecting_language = False
+
+# (audio, mel) computed by the shared front end for the running task; Whisper's
+# own log-mel call is answered from it instead of recomputing the spectrogram
+_frontend_mel = None
+
+
+def _worker_init(registry_kwargs, torch_threads, shared_registry=None, warmup=True,
+                 cpu_slots=None, interop_threads=1):
+    """Initialize a worker: configure torch threading, preload the default model and warm it up
+
+    With ``cpu_slots`` (a queue of CPU sets) the worker claims one set, pins
+    itself to it and sizes its thread pools to match instead of using
+    ``torch_threads``.
+    """
+    global _registry, _warmup_seconds, _cpus
+    if cpu_slots is not None:
+        _cpus = cpu_slots.get()
+        pin_current_process(_cpus, interop_threads)
+    elif torch_threads:
+        try:
+            import torch
+            torch.set_num_threads(torch_threads)
+        except ImportError:
+            pass
+    _registry = shared_registry or ModelRegistry(**registry_kwargs)
+    model = _registry.get()
+    if warmup:
+        try:
+            _warmup_seconds = _warmup(model)
+        except Exception as e:
+            # A failed warmup only costs the first request its one-time setup
+            print(f"Warmup inference failed: {e}")
+
+
+def _warmup(model):
+    """Run one short decode on synthetic audio so the first real request skips one-time costs
+
+    The first forward pass pays for kernel selection, allocator growth and lazy
+    initialization inside PyTorch and Whisper (mel filters, tokenizer, language
+    detection). Decoding a few tokens of quiet noise covers all of them.
+    """
+    if is_simulated(model):
+        return 0.0
+    import numpy as np
+    import whisper
+
+    started = time.time()
+    rng = np.random.default_rng(0)
+    audio = (rng.standard_normal(whisper.audio.SAMPLE_RATE) * 0.01).astype(np.float32)
+    mel = whisper.log_mel_spectrogram(whisper.pad_or_trim(audio), model.dims.n_mels).to(model.device)
+    whisper.decode(model, mel, whisper.DecodingOptions(
+        sample_len=4, without_timestamps=True, fp16=model.device.type != 'cpu'
+    ))
+    elapsed = time.time() - started
+    print(f"Warmup inference finished in {elapsed:.2f}s")
+    return elapsed
+
+
+def _add_stage(stage, seconds):
+    if _stages is not None:
+        _stages[stage] = _stages.get(stage, 0.0) + seconds
+
+
+def _timed(stage, fn):
+    def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _add_stage(stage, time.perf_counter() - started)
+    return wrapper
+
+
+def _use_frontend_mel(fn):
+    def log_mel_spectrogram(audio, *args, **kwargs):
+        if _frontend_mel is not None and audio is _frontend_mel[0]:
+            return _frontend_mel[1]
+        return fn(audio, *args, **kwargs)
+    return log_mel_spectrogram
+
+
+def _instrument(model):
+    """Time the log-mel, language detection and encoder stages of a Whisper model
+
+    Token decoding is whatever remains of the transcription time. Encoder
+    passes made while detecting the language count towards language detection.
+    The encoder also gets an EncoderMemo, so temperature fallbacks reuse the
+    encoding of their window, and the first decode of a clip of 30 s or more
+    reuses the language-detection pass. Shorter clips are detected on
+    Whisper's silence-padded window but decoded on a zero-padded one, so
+    their detection input is left as upstream has it and is encoded twice.
+    """
+    global _detecting_language
+    if is_simulated(model) or getattr(model, '_stage_timing', False):
+        return
+    import importlib
+    # whisper.transcribe is shadowed by the function of the same name
+    transcribe_module = importlib.import_module('whisper.transcribe')
+
+    if not getattr(transcribe_module.log_mel_spectrogram, '_stage_timing', False):
+        transcribe_module.log_mel_spectrogram = _timed('log_mel', _use_frontend_mel(transcribe_module.log_mel_spectrogram))
+        transcribe_module.log_mel_spectrogram._stage_timing = True
+
+    encoder_started = []
+
+    def before_encoder(module, args):
+        encoder_started.append(time.perf_counter())
+
+    def after_encoder(module, args, output):
+        if output.is_cuda:
+            import torch
+            torch.cuda.synchronize(output.device)
+        elapsed = time.perf_counter() - encoder_started.pop()
+        if not _detecting_language:
+            _add_stage('encoder', elapsed)
+
+    def detect_language(*args, **kwargs):
+        global _detecting_language
+        _detecting_language = True
+        started = time.perf_counter()
+        try:
+            return detect(*args, **kwargs)
+        finally:
+            _detecting_language = False
+            _add_stage('language_detection', time.perf_counter() - started)
+
+    detect = model.detect_language
+    model.detect_language = detect_language
+    model.encoder.forward = EncoderMemo(model.encoder.forward)
+    model.encoder.register_forward_pre_hook(before_encoder)
+    model.encoder.register_forward_hook(after_encoder)
+    model._stage_timing = True
+
+
+def _begin_stages():
+    global _stages
+    _stages = {}
+
+
+def _encoder_reuses(model):
+    """Encoder passes saved by the model's EncoderMemo during this task; releases the memo"""
+    memo = getattr(getattr(model, 'encoder', None), 'forward', None)
+    if not isinstance(memo, EncoderMemo):
+        return 0
+    reuses, memo.reuses = memo.reuses, 0
+    memo.clear()
+    return reuses
+
+
+def _end_stages(elapsed):
+    """Collect the stage timings of the finished task; token decoding is the unattributed rest"""
+    global _stages
+    stages, _stages = _stages, None
+    if stages:
+        stages['decoding'] = max(0.0, elapsed - sum(stages.values()))
+    return stages
+
+
+def _audio_seconds(audio):
+    return None if isinstance(audio, str) else len(audio) / float(SAMPLE_RATE)
+
+
+def _worker_info():
+    loaded = _registry.status()['loaded_models']
+    return {
+        'pid': os.getpid(),
+        'loaded_models': [m['name'] for m in loaded],
+        'load_seconds': {m['name']: m['load_seconds'] for m in loaded},
+        'mock': _registry.is_mock(),
+        'warmup_seconds': None if _warmup_seconds is None else round(_warmup_seconds, 3),
+        'rss_bytes': process_rss_bytes(),
+        'cpus': _cpus,
+    }
+
+
+def ping_task():
+    """No-op task used to spawn workers and wait for their models to load"""
+    return {'worker': _worker_info()}
+
+
+def _format_result(result, model, elapsed, retries=0):
+    """Reduce a Whisper result to the picklable fields the API returns"""
+    return {
+        'text': result['text'].strip(),
+        'language': result.get('language', 'unknown'),
+        'segments': [
+            {'start': s['start'], 'end': s['end'], 'text': s['text']}
+            for s in result.get('segments', [])
+        ],
+        'mock': isinstance(model, MockWhisperModel),
+        'inference_seconds': elapsed,
+        'retries': retries,
+    }
+
+
+def transcribe_task(model_name, audio, options=None):
+    """Transcribe a file path or float32 array with the worker's model replica"""
+    global _frontend_mel
+    model = _registry.get(model_name)
+    _instrument(model)
+    options = dict(options or {})
+    _begin_stages()
+    started = time.time()
+    if not is_simulated(model):
+        # fp16 only helps on GPU; on CPU Whisper would warn and fall back per call
+        options.setdefault('fp16', model.device.type != 'cpu')
+        if not isinstance(audio, str):
+            from whisper.audio import N_SAMPLES
+            mel_started = time.perf_counter()
+            # Whisper pads the whole recording with 30 s of silence before its STFT
+            mel = log_mel_batch([audio], model.dims.n_mels, total_samples=len(audio) + N_SAMPLES)[0]
+            _add_stage('log_mel', time.perf_counter() - mel_started)
+            _frontend_mel = (audio, mel)
+    try:
+        result = model.transcribe(audio, **options)
+    finally:
+        _frontend_mel = None
+    elapsed = time.time() - started
+    retries = count_retries(result.get('segments', []), options.get('temperature', 0.0))
+    formatted = _format_result(result, model, elapsed, retries)
+    formatted['encoder_reuses'] = _encoder_reuses(model)
+    formatted['stages'] = _end_stages(elapsed)
+    formatted['audio_seconds'] = _audio_seconds(audio)
+    formatted['worker'] = _worker_info()
+    return formatted
+
+
+def transcribe_batch_task(model_name, audios, options=None):
+    """Transcribe several short clips with one batched encoder/greedy-decoder pass
+
+    Clips that fit a single 30-second Whisper window are padded, stacked into
+    one mel batch and decoded together. Longer clips fall back to a regular
+    per-clip transcribe call so a batch always returns one result per input.
+    """
+    model = _registry.get(model_name)
+    _instrument(model)
+    _begin_stages()
+    started = time.time()
+    options = dict(options or {})
+    results = [None] * len(audios)
+
+    if is_simulated(model):
+        for i, audio in enumerate(audios):
+            results[i] = model.transcribe(audio, **options)
+    else:
+        import dataclasses
+        import torch
+        import whisper
+
+        clips = [whisper.load_audio(a) if isinstance(a, str) else a for a in audios]
+        short = [i for i, clip in enumerate(clips) if len(clip) <= whisper.audio.N_SAMPLES]
+        for i in range(len(clips)):
+            if i not in short:
+                results[i] = model.transcribe(clips[i], **options)
+
+        if short:
+            # One batched STFT for every clip of this micro-batch instead of one per clip
+            mel_started = time.perf_counter()
+            mel = torch.stack(log_mel_batch(
+                [clips[i] for i in short], model.dims.n_mels,
+                total_samples=whisper.audio.N_SAMPLES, device=model.device
+            ))
+            _add_stage('log_mel', time.perf_counter() - mel_started)
+            fields = {f.name for f in dataclasses.fields(whisper.DecodingOptions)}
+            decode_options = whisper.DecodingOptions(**{
+                'temperature': 0.0,
+                'without_timestamps': True,
+                'fp16': model.device.type != 'cpu',
+                **{k: v for k, v in options.items() if k in fields},
+            })
+            for i, decoded in zip(short, whisper.decode(model, mel, decode_options)):
+                duration = len(clips[i]) / whisper.audio.SAMPLE_RATE
+                results[i] = {
+                    'text': decoded.text,
+                    'language': decoded.language,
+                    'segments': [{'start': 0.0, 'end': duration, 'text': decoded.text}],
+                }
+
+    elapsed = time.time() - started
+    formatted = [_format_result(r, model, elapsed) for r in results]
+    for r, audio in zip(formatted, audios):
+        r['batch_size'] = len(audios)
+        r['audio_seconds'] = _audio_seconds(audio)
+    durations = [r['audio_seconds'] for r in formatted]
+    return {
+        'results': formatted,
+        'encoder_reuses': _encoder_reuses(model),
+        'stages': _end_stages(elapsed),
+        'audio_seconds': None if None in durations else sum(durations),
+        'inference_seconds': elapsed,
+        'worker': _worker_info(),
+    }
+
+
+class _Job:
+    def __init__(self, fn, args, kwargs, priority, audio_seconds, estimated_seconds):
+        self.fn = fn
+        self.args = args
+        self.kwargs = kwargs
+        self.priority = priority
+        self.audio_seconds = audio_seconds
+        self.estimated_seconds = estimated_seconds
+        self.future = Future()
+        self.submitted_at = time.time()
+
+
+class InferencePool:
+    """Bounded queue in front of a fixed set of inference workers
+
+    ``workers`` > 0 runs that many worker processes, each with its own model
+    replica. ``workers`` == 0 runs inference inline on a single background
+    thread sharing ``registry``, which is convenient for development and for
+    servers that fork their own workers.
+
+    ``ready`` only becomes true once every worker has loaded and warmed up its
+    model, so it can back a readiness probe while the server is already live.
+
+    ``cpu_sets`` (a list of CPU lists, or a callable returning one, resolved
+    when the pool starts) runs one worker per set, each pinned to its cores.
+
+    Each submission has a priority class and an audio duration. Its cost is
+    estimated from the duration and the measured real-time factor, and
+    ``scheduler_policy`` ('sjf' or 'fifo'), ``aging_rate`` and
+    ``class_delays`` decide the order in which queued work is dispatched
+    (see scheduling.py).
+    """
+
+    def __init__(self, registry, workers=1, queue_size=16, torch_threads=None,
+                 start_method='spawn', timeout=300, warmup=True, metrics=None,
+                 cpu_sets=None, interop_threads=1, scheduler_policy='sjf', aging_rate=1.0,
+                 class_delays=None, initial_rtf=0.5):
+        self.registry = registry
+        self.workers = workers
+        self.cpu_sets = cpu_sets
+        self.interop_threads = interop_threads
+        self.queue_size = queue_size
+        self.torch_threads = torch_threads
+        self.start_method = start_method
+        self.timeout = timeout
+        self.warmup = warmup
+        self.metrics = metrics
+        self.ready = False
+        self.starting = False
+        self.startup_error = None
+        self.startup_seconds = None
+        self.model_type = None
+        self.worker_status = {}
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        # Smoothed inference seconds per audio second, used to estimate queued tasks' cost
+        self.rtf = initial_rtf
+        self.wait_stats = WaitStats()
+        self._queue = PriorityJobQueue(queue_size, scheduler_policy, aging_rate, class_delays)
+        self._slots = threading.Semaphore(max(workers, 1))
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._executor = None
+        self._dispatcher = None
+
+    def start(self):
+        """Spawn the workers and block until each has loaded and warmed up the default model"""
+        started = time.time()
+        with self._lock:
+            if self._executor is not None:
+                return
+            self.starting = True
+            registry_kwargs = {
+                'default_model': self.registry.default_model,
+                'default_precision': self.registry.default_precision,
+                'allowed_models': sorted(self.registry.allowed_models),
+                'memory_budget_mb': self.registry.memory_budget_mb,
+                'device': self.registry.device,
+                'fake_rtf': self.registry.fake_rtf,
+                'fake_overhead_seconds': self.registry.fake_overhead_seconds,
+            }
+            cpu_sets = self.cpu_sets() if callable(self.cpu_sets) else self.cpu_sets
+            if cpu_sets and self.workers > 0:
+                self.workers = len(cpu_sets)
+                self._slots = threading.Semaphore(self.workers)
+            if self.workers > 0:
+                print(f"Starting {self.workers} inference worker process(es)...")
+                context = multiprocessing.get_context(self.start_method)
+                cpu_slots = self._cpu_slots(context.Queue(), cpu_sets)
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=context,
+                    initializer=_worker_init,
+                    initargs=(registry_kwargs, self.torch_threads, None, self.warmup, cpu_slots, self.interop_threads)
+                )
+            else:
+                print("Running inference inline on a single worker thread...")
+                cpu_slots = self._cpu_slots(queue.Queue(), cpu_sets[:1] if cpu_sets else None)
+                self._executor = ThreadPoolExecutor(
+                    max_workers=1,
+                    initializer=_worker_init,
+                    initargs=(registry_kwargs, self.torch_threads, self.registry, self.warmup, cpu_slots, self.interop_threads)
+                )
+            self._dispatcher = threading.Thread(target=self._dispatch_loop, name='inference-dispatcher', daemon=True)
+            self._dispatcher.start()
+
+        try:
+            pings = [self._executor.submit(ping_task) for _ in range(max(self.workers, 1))]
+            for ping in pings:
+                self._record_worker(ping.result())
+        except Exception as e:
+            self.startup_error = str(e)
+            raise
+        finally:
+            self.starting = False
+        if all(w['mock'] for w in self.worker_status.values()):
+            self.model_type = 'mock'
+        else:
+            self.model_type = 'fake' if self.registry.fake_rtf else 'whisper'
+        self.startup_seconds = time.time() - started
+        self.ready = True
+        print(f"Inference workers ready after {self.startup_seconds:.1f}s")
+
+    def start_in_background(self):
+        """Start the workers on a background thread so the server can bind immediately"""
+        def run():
+            try:
+                self.start()
+            except Exception as e:
+                print(f"Inference workers failed to start: {e}")
+        thread = threading.Thread(target=run, name='inference-startup', daemon=True)
+        thread.start()
+        return thread
+
+    def shutdown(self, wait=False):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    @staticmethod
+    def _cpu_slots(slots, cpu_sets):
+        """Fill ``slots`` with one CPU set per worker; each worker claims one as it starts"""
+        if not cpu_sets:
+            return None
+        for cpus in cpu_sets:
+            slots.put(cpus)
+        return slots
+
+    def submit(self, fn, *args, priority=None, audio_seconds=None, **kwargs):
+        """Queue ``fn(*args, **kwargs)`` for a worker; raises QueueFullError when the queue is full
+
+        ``priority`` is a scheduling class ('interactive' by default) and
+        ``audio_seconds`` the amount of audio the task transcribes, from
+        which its place in the queue is estimated.
+        """
+        priority = normalize_priority(priority)
+        if self._executor is None:
+            self.start()
+        estimated = None if audio_seconds is None else audio_seconds * self.rtf
+        job = _Job(fn, args, kwargs, priority, audio_seconds, estimated)
+        try:
+            self._queue.put_nowait(job)
+        except queue.Full:
+            self.rejected += 1
+            raise QueueFullError(f"Inference queue is full ({self.queue_size} pending requests)")
+        return job.future
+
+    def submit_transcription(self, model_name, audio, options=None, priority=None):
+        """Queue a transcription; returns a future resolving to its result"""
+        return self.submit(transcribe_task, model_name, audio, options,
+                           priority=priority, audio_seconds=_audio_seconds(audio))
+
+    def transcribe(self, model_name, audio, options=None, priority=None):
+        """Submit a transcription and wait for its result"""
+        return self.submit_transcription(model_name, audio, options, priority).result(timeout=self.timeout)
+
+    def status(self):
+        return {
+            'workers': self.workers,
+            'ready': self.ready,
+            'starting': self.starting,
+            'startup_seconds': None if self.startup_seconds is None else round(self.startup_seconds, 2),
+            'startup_error': self.startup_error,
+            'queue_depth': self._queue.qsize(),
+            'queue_size': self.queue_size,
+            'scheduler': {
+                'policy': self._queue.policy,
+                'real_time_factor': round(self.rtf, 3),
+                'queued': self._queue.depth_by_class(),
+                'waits': self.wait_stats.summary(),
+            },
+            'in_flight': self._in_flight,
+            'completed': self.completed,
+            'failed': self.failed,
+            'rejected': self.rejected,
+            'worker_processes': list(self.worker_status.values()),
+        }
+
+    def _dispatch_loop(self):
+        while True:
+            self._slots.acquire()
+            job = self._queue.get()
+            if not job.future.set_running_or_notify_cancel():
+                self._slots.release()
+                continue
+            with self._lock:
+                self._in_flight += 1
+            waited = time.time() - job.submitted_at
+            self.wait_stats.record(job.priority, waited)
+            if self.metrics is not None:
+                self.metrics.observe_stage('queue', waited)
+                self.metrics.observe('queue_wait_seconds', waited, {'priority': job.priority},
+                                     help_text='Time tasks waited for an inference worker, by priority class')
+            try:
+                inner = self._executor.submit(job.fn, *job.args, **job.kwargs)
+            except Exception as e:
+                self._finish(job, None, e)
+                continue
+            inner.add_done_callback(lambda f, job=job: self._finish(job, f, None))
+
+    def _finish(self, job, inner, error):
+        with self._lock:
+            self._in_flight -= 1
+        self._slots.release()
+        if error is None:
+            error = inner.exception()
+        if error is not None:
+            self.failed += 1
+            job.future.set_exception(error)
+            return
+        result = inner.result()
+        self._record_worker(result)
+        self._update_rtf(result)
+        if self.metrics is not None:
+            self.metrics.observe_inference(result)
+        self.completed += 1
+        job.future.set_result(result)
+
+    def _update_rtf(self, result):
+        if isinstance(result, dict) and result.get('audio_seconds') and result.get('inference_seconds') is not None:
+            self.rtf = 0.8 * self.rtf + 0.2 * result['inference_seconds'] / result['audio_seconds']
+
+    def _record_worker(self, result):
+        if isinstance(result, dict) and 'worker' in result:
+            self.worker_status[result['worker']['pid']] = result['worker']
@@ -0,0 +1,165 @@
+"""
+Asynchronous transcription jobs with admission control
+
+Submitting a job returns immediately with a job ID; clients poll or long-poll
+for the result instead of holding a connection open for the whole Whisper
+run. The job queue is bounded both by count and by estimated drain time:
+the audio seconds already queued, times the observed real-time factor, spread
+over the available workers. When a new job would push the drain time past the
+limit it is rejected up front, with a Retry-After hint, rather than accepted
+and left to time out.
+"""
+
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+
+class OverloadedError(Exception):
+    """Raised when the job queue cannot take more work; carries a Retry-After hint"""
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Job:
+    """One submitted transcription and its outcome"""
+
+    def __init__(self, audio_seconds, model_name):
+        self.id = uuid.uuid4().hex
+        self.audio_seconds = audio_seconds
+        self.model_name = model_name
+        self.status = 'queued'
+        self.result = None
+        self.error = None
+        self.created_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.done = threading.Event()
+
+    def to_dict(self):
+        data = {
+            'job_id': self.id,
+            'status': self.status,
+            'model': self.model_name,
+            'audio_seconds': round(self.audio_seconds, 3),
+            'created_at': self.created_at,
+        }
+        if self.started_at is not None:
+            data['queue_seconds'] = round(self.started_at - self.created_at, 3)
+        if self.finished_at is not None:
+            data['processing_seconds'] = round(self.finished_at - self.started_at, 3)
+        if self.result is not None:
+            data['result'] = self.result
+        if self.error is not None:
+            data['error'] = self.error
+        return data
+
+
+class JobManager:
+    """Runs jobs on a fixed number of runner threads and sheds load it cannot drain in time"""
+
+    def __init__(self, workers=1, max_queued=64, max_drain_seconds=120, initial_rtf=0.5,
+                 result_ttl=600):
+        self.workers = max(workers, 1)
+        self.max_queued = max_queued
+        self.max_drain_seconds = max_drain_seconds
+        self.rtf = initial_rtf
+        self.result_ttl = result_ttl
+        self.accepted = 0
+        self.rejected = 0
+        self._jobs = {}
+        self._pending_audio = 0.0
+        self._pending_count = 0
+        self._lock = threading.Lock()
+        self._runners = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix='job-runner')
+
+    def estimated_drain_seconds(self, extra_audio_seconds=0.0):
+        """Seconds until all queued and running work (plus ``extra_audio_seconds``) would finish"""
+        return (self._pending_audio + extra_audio_seconds) * self.rtf / self.workers
+
+    def submit(self, audio_seconds, model_name, fn, *args):
+        """Admit a job running ``fn(*args)`` or raise OverloadedError"""
+        self._purge_finished()
+        with self._lock:
+            drain = self.estimated_drain_seconds(audio_seconds)
+            if self._pending_count >= self.max_queued or drain > self.max_drain_seconds:
+                self.rejected += 1
+                # Suggest retrying once the current backlog has drained below the limit
+                retry_after = max(1, int(self.estimated_drain_seconds() - self.max_drain_seconds
+                                         + audio_seconds * self.rtf / self.workers) + 1)
+                raise OverloadedError(
+                    f"Transcription queue is overloaded (estimated drain {drain:.0f}s)", retry_after
+                )
+            job = Job(audio_seconds, model_name)
+            self._jobs[job.id] = job
+            self._pending_audio += audio_seconds
+            self._pending_count += 1
+            self.accepted += 1
+        self._runners.submit(self._run, job, fn, args)
+        return job
+
+    def add_completed(self, audio_seconds, model_name, result):
+        """Record a job whose result was already available (e.g. from the cache)"""
+        job = Job(audio_seconds, model_name)
+        job.started_at = job.finished_at = job.created_at
+        job.result = result
+        job.status = 'completed'
+        job.done.set()
+        with self._lock:
+            self._jobs[job.id] = job
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def wait(self, job, timeout):
+        """Block up to ``timeout`` seconds for a job to finish (long polling)"""
+        if timeout > 0:
+            job.done.wait(timeout)
+        return job
+
+    def status(self):
+        with self._lock:
+            return {
+                'queued_or_running': self._pending_count,
+                'max_queued': self.max_queued,
+                'pending_audio_seconds': round(self._pending_audio, 1),
+                'estimated_drain_seconds': round(self.estimated_drain_seconds(), 1),
+                'max_drain_seconds': self.max_drain_seconds,
+                'real_time_factor': round(self.rtf, 3),
+                'accepted': self.accepted,
+                'rejected': self.rejected,
+            }
+
+    def _run(self, job, fn, args):
+        job.status = 'running'
+        job.started_at = time.time()
+        try:
+            job.result = fn(*args)
+            job.status = 'completed'
+        except Exception as e:
+            print(f"Job {job.id[:8]} failed: {e}")
+            job.error = str(e)
+            job.status = 'failed'
+        finally:
+            job.finished_at = time.time()
+            with self._lock:
+                self._pending_audio -= job.audio_seconds
+                self._pending_count -= 1
+                if job.status == 'completed' and job.audio_seconds > 0:
+                    # Exponentially weighted real-time factor of recent jobs
+                    observed = (job.finished_at - job.started_at) / job.audio_seconds
+                    self.rtf = 0.8 * self.rtf + 0.2 * observed
+            job.done.set()
+
+    def _purge_finished(self):
+        cutoff = time.time() - self.result_ttl
+        with self._lock:
+            expired = [jid for jid, job in self._jobs.items()
+                       if job.finished_at is not None and job.finished_at < cutoff]
+            for jid in expired:
+                del self._jobs[jid]
@@ -0,0 +1,71 @@
+"""
+Language hints and per-session language memory
+
+Whisper spends a decoder pass on language detection for every clip unless it
+is told the language. Clients can pass a hint, and the language detected for
+a session is remembered so its follow-up clips skip detection as well.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Language codes accepted by Whisper (whisper.tokenizer.LANGUAGES), kept here so
+# validating a hint does not import torch into the web process
+LANGUAGE_CODES = frozenset((
+    'en zh de es ru ko fr ja pt tr pl ca nl ar sv it id hi fi vi he uk el ms cs ro da hu ta no '
+    'th ur hr bg lt la mi ml cy sk te fa lv bn sr az sl kn et mk br eu is hy ne mn bs kk sq sw '
+    'gl mr pa si km sn yo so af oc ka be tg sd gu am yi lo uz fo ht ps tk nn mt sa lb my bo tl '
+    'mg as tt haw ln ha ba jw su yue'
+).split())
+
+
+def normalize_language(value):
+    """Validate a language hint; returns a Whisper language code, or None for auto-detection"""
+    if value is None:
+        return None
+    code = value.strip().lower().replace('_', '-').split('-')[0]
+    if code in ('', 'auto'):
+        return None
+    if code not in LANGUAGE_CODES:
+        raise ValueError(f"Unsupported language '{value}'. Use a language code such as 'en' or 'hi', or 'auto'")
+    return code
+
+
+class LanguageMemory:
+    """Remembers the language of each session for ``ttl_seconds``, evicting the oldest beyond ``max_sessions``"""
+
+    def __init__(self, max_sessions=10000, ttl_seconds=3600):
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self._languages = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        if not session_id:
+            return None
+        with self._lock:
+            entry = self._languages.get(session_id)
+            if entry is None:
+                return None
+            language, stored_at = entry
+            if time.time() - stored_at > self.ttl_seconds:
+                del self._languages[session_id]
+                return None
+            self._languages.move_to_end(session_id)
+            self.hits += 1
+            return language
+
+    def remember(self, session_id, language):
+        if not session_id or language not in LANGUAGE_CODES:
+            return
+        with self._lock:
+            self._languages[session_id] = (language, time.time())
+            self._languages.move_to_end(session_id)
+            while len(self._languages) > self.max_sessions:
+                self._languages.popitem(last=False)
+
+    def status(self):
+        with self._lock:
+            return {'sessions': len(self._languages), 'hits': self.hits}
@@ -0,0 +1,160 @@
+"""
+Latency histograms and gauges exposed in the Prometheus text format
+
+Stage timings measured inside the inference workers (log-mel, language
+detection, encoder, token decoding) travel back with each result and are
+recorded here alongside the stages timed in the request thread (upload
+receive, decode/resample, VAD, queue wait, response). Gauges such as queue
+depth and cache hit rate are read from their owners when /metrics is scraped.
+"""
+
+import os
+import resource
+import sys
+import threading
+
+# Upper bounds in seconds, spanning sub-millisecond stages to multi-minute recordings
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+
+# Real-time factor (processing seconds per audio second)
+RTF_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 1.5, 2.0, 5.0)
+
+
+def process_rss_bytes():
+    """Current resident set size of this process, or its peak where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, IndexError):
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # ru_maxrss is in bytes on macOS and kilobytes on Linux
+        return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    escaped = (
+        (k, str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n'))
+        for k, v in labels
+    )
+    return '{' + ','.join(f'{k}="{v}"' for k, v in escaped) + '}'
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observations for one label set"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.total = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+        self.total += value
+        self.count += 1
+
+
+class Metrics:
+    """Thread-safe registry of histograms and counters, plus gauges sampled at scrape time"""
+
+    def __init__(self, prefix='stt'):
+        self.prefix = prefix
+        self._histograms = {}
+        self._counters = {}
+        self._help = {}
+        self._gauges = []
+        self._lock = threading.Lock()
+
+    def observe(self, name, value, labels=None, buckets=DEFAULT_BUCKETS, help_text=''):
+        """Record one observation in histogram ``name`` with the given labels"""
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._histograms.setdefault(name, {})
+            if key not in series:
+                series[key] = Histogram(buckets)
+                self._help.setdefault(name, help_text)
+            series[key].observe(value)
+
+    def increment(self, name, amount=1, labels=None, help_text=''):
+        key = tuple(sorted((labels or {}).items()))
+        with self._lock:
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + amount
+            self._help.setdefault(name, help_text)
+
+    def observe_stage(self, stage, seconds):
+        self.observe('stage_seconds', seconds, {'stage': stage},
+                     help_text='Time spent in each transcription stage')
+
+    def observe_stages(self, stages):
+        for stage, seconds in (stages or {}).items():
+            self.observe_stage(stage, seconds)
+
+    def observe_inference(self, result):
+        """Record the worker-side stage timings and real-time factor carried by an inference result"""
+        if not isinstance(result, dict):
+            return
+        self.observe_stages(result.get('stages'))
+        audio_seconds = result.get('audio_seconds')
+        if audio_seconds and result.get('inference_seconds') is not None:
+            self.observe('real_time_factor', result['inference_seconds'] / audio_seconds, buckets=RTF_BUCKETS,
+                         help_text='Inference seconds per second of audio')
+            self.increment('audio_seconds_total', audio_seconds,
+                           help_text='Seconds of audio transcribed by the inference workers')
+        if result.get('encoder_reuses'):
+            self.increment('encoder_reuses_total', result['encoder_reuses'],
+                           help_text='Encoder passes skipped by reusing the features of an identical window')
+        if result.get('retries'):
+            self.increment('decode_retries_total', result['retries'],
+                           help_text='Temperature-fallback re-decodes of 30-second windows')
+
+    def gauge(self, name, read, help_text=''):
+        """Register a gauge; ``read()`` returns a number or a list of (labels dict, number) pairs"""
+        self._gauges.append((name, read, help_text))
+
+    def render(self):
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._histograms.items()):
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {full} histogram")
+                for key, histogram in sorted(series.items()):
+                    for bound, count in zip(histogram.buckets, histogram.counts):
+                        labels = _format_labels(key + (('le', _format_value(float(bound))),))
+                        lines.append(f"{full}_bucket{labels} {count}")
+                    lines.append(f"{full}_bucket{_format_labels(key + (('le', '+Inf'),))} {histogram.count}")
+                    lines.append(f"{full}_sum{_format_labels(key)} {_format_value(histogram.total)}")
+                    lines.append(f"{full}_count{_format_labels(key)} {histogram.count}")
+            for name, series in sorted(self._counters.items()):
+                full = f"{self.prefix}_{name}"
+                lines.append(f"# HELP {full} {self._help.get(name, '')}")
+                lines.append(f"# TYPE {full} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{full}{_format_labels(key)} {_format_value(value)}")
+
+        for name, read, help_text in self._gauges:
+            try:
+                value = read()
+            except Exception as e:
+                print(f"Could not read metric {name}: {e}")
+                continue
+            samples = value if isinstance(value, list) else [({}, value)]
+            full = f"{self.prefix}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} gauge")
+            for labels, sample in samples:
+                if sample is not None:
+                    lines.append(f"{full}{_format_labels(sorted(labels.items()))} {_format_value(sample)}")
+        return '\n'.join(lines) + '\n'
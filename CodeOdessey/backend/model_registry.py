@@ -0,0 +1,292 @@
+"""
+Lazy-loading registry of Whisper models with LRU eviction under a RAM budget
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+# Approximate fp32 resident size of each Whisper checkpoint in MB, used to make
+# room before a model is loaded (the real size is measured once it is resident)
+ESTIMATED_MODEL_SIZE_MB = {
+    'tiny': 150,
+    'base': 290,
+    'small': 970,
+    'medium': 3050,
+    'large': 6200,
+}
+
+# Supported weight precisions; int8 applies dynamic quantization to linear layers
+PRECISIONS = ('fp32', 'int8')
+
+# Share of the fp32 size left after int8 quantization (embeddings and convs stay fp32)
+INT8_SIZE_RATIO = 0.45
+
+
+class MockWhisperModel:
+    """Stand-in model used when Whisper or its weights are unavailable"""
+
+    def transcribe(self, audio, **kwargs):
+        return {
+            "text": "This is a mock transcription. Please install Whisper dependencies for real transcription.",
+            "language": "en"
+        }
+
+
+class FakeWhisperModel:
+    """Latency-simulating stand-in for benchmarks on machines without model weights
+
+    Sleeps ``overhead_seconds`` plus ``rtf`` seconds per second of audio, so
+    queueing, batching and concurrency behave as they would with a real model
+    of that speed. Unlike the mock, its results count as real transcriptions:
+    they are cached and reported like Whisper's, so load tests see the same
+    cache and metrics behaviour as production.
+    """
+
+    def __init__(self, rtf=0.1, overhead_seconds=0.05):
+        self.rtf = rtf
+        self.overhead_seconds = overhead_seconds
+
+    def transcribe(self, audio, **kwargs):
+        duration = 0.0 if audio is None or isinstance(audio, str) else len(audio) / 16000.0
+        time.sleep(self.overhead_seconds + self.rtf * duration)
+        text = f"Simulated transcription of {duration:.1f} seconds of audio."
+        return {
+            "text": text,
+            "language": "en",
+            "segments": [{"start": 0.0, "end": duration, "text": text}],
+        }
+
+
+def is_simulated(model):
+    """True for stand-ins (mock fallback or fake engine) that have no Whisper internals to hook"""
+    return isinstance(model, (MockWhisperModel, FakeWhisperModel))
+
+
+def split_model_key(key):
+    """Split a registry key like "small:int8" into its model name and precision"""
+    name, _, precision = key.partition(':')
+    return name, precision or 'fp32'
+
+
+def estimate_model_size_mb(key):
+    """Estimate the resident size of a model before loading it"""
+    name, precision = split_model_key(key)
+    base_name = name.split('.')[0].split('-')[0]
+    size = ESTIMATED_MODEL_SIZE_MB.get(base_name, ESTIMATED_MODEL_SIZE_MB['large'])
+    return size * INT8_SIZE_RATIO if precision == 'int8' else size
+
+
+def measure_model_size_mb(model):
+    """Measure the parameter, buffer and packed quantized weight memory held by a loaded model"""
+    if not hasattr(model, 'parameters'):
+        return 0.0
+    total = sum(p.numel() * p.element_size() for p in model.parameters())
+    total += sum(b.numel() * b.element_size() for b in model.buffers())
+    for module in model.modules():
+        # Dynamically quantized linear layers keep their weights in packed params
+        if hasattr(module, '_packed_params') and callable(getattr(module, 'weight', None)):
+            weight = module.weight()
+            total += weight.numel() * weight.element_size()
+            if module.bias() is not None:
+                total += module.bias().numel() * module.bias().element_size()
+    return total / (1024 * 1024)
+
+
+def quantize_int8(model):
+    """Apply dynamic int8 quantization to the linear layers of a CPU Whisper model"""
+    import torch
+    for module in model.modules():
+        if isinstance(module, torch.nn.Linear):
+            # whisper.model.Linear only adds a dtype cast in forward(); quantize_dynamic
+            # swaps modules by exact type, so present them as plain nn.Linear
+            module.__class__ = torch.nn.Linear
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+class ModelEntry:
+    """A resident model and its bookkeeping"""
+
+    def __init__(self, name, model, size_mb, load_seconds):
+        self.name = name
+        self.model = model
+        self.size_mb = size_mb
+        self.load_seconds = load_seconds
+        self.last_used = time.time()
+
+    @property
+    def is_mock(self):
+        return isinstance(self.model, MockWhisperModel)
+
+
+class ModelRegistry:
+    """Loads Whisper models on first use and evicts least recently used ones
+
+    Models are keyed by name ("tiny", "base", "small.en", ...), with a ":int8"
+    suffix for dynamically quantized CPU variants. When loading a
+    model would push the resident total over ``memory_budget_mb``, the least
+    recently used models are dropped first. A model that alone exceeds the
+    budget is still loaded so requests for it can be served.
+    """
+
+    def __init__(self, default_model='small', allowed_models=None, memory_budget_mb=2048, device=None,
+                 default_precision='fp32', fake_rtf=None, fake_overhead_seconds=0.05):
+        if default_precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{default_precision}'. Available: {', '.join(PRECISIONS)}")
+        self.default_model = default_model
+        self.default_precision = default_precision
+        self.allowed_models = set(allowed_models or [default_model])
+        self.allowed_models.add(default_model)
+        self.memory_budget_mb = memory_budget_mb
+        self.device = device
+        # When set, every model is a FakeWhisperModel with this real-time factor
+        self.fake_rtf = fake_rtf
+        self.fake_overhead_seconds = fake_overhead_seconds
+        self._models = OrderedDict()
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.evictions = 0
+
+    @property
+    def default_key(self):
+        return self.resolve()
+
+    def resolve(self, name=None, precision=None):
+        """Return the registry key to use for a request, validating name and precision"""
+        name = (name or self.default_model).strip()
+        if ':' in name:
+            name, precision = split_model_key(name)
+        if name not in self.allowed_models:
+            raise ValueError(
+                f"Unknown model '{name}'. Available models: {', '.join(sorted(self.allowed_models))}"
+            )
+        precision = precision or self.default_precision
+        if precision not in PRECISIONS:
+            raise ValueError(f"Unknown precision '{precision}'. Available: {', '.join(PRECISIONS)}")
+        return name if precision == 'fp32' else f"{name}:{precision}"
+
+    def english_variant(self, key, english_model=None):
+        """Registry key of the English-only model to use for English audio instead of ``key``
+
+        ``english_model`` names a preferred English-only model (e.g. a smaller
+        "base.en"); otherwise the ".en" sibling of the requested model is used.
+        Falls back to ``key`` when no allowed English-only model fits.
+        """
+        name, precision = split_model_key(key)
+        if name.endswith('.en'):
+            return key
+        candidate = english_model or f"{name}.en"
+        if candidate not in self.allowed_models:
+            return key
+        return candidate if precision == 'fp32' else f"{candidate}:{precision}"
+
+    def get(self, key=None):
+        """Return the model for a registry key (as returned by resolve), loading it if needed"""
+        # Keys are exact: a bare name means fp32 regardless of the default precision
+        name = self.resolve(*split_model_key(key)) if key else self.default_key
+
+        with self._lock:
+            entry = self._touch(name)
+            if entry is not None:
+                return entry.model
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+
+        # Serialize loads of the same model so concurrent requests share one load
+        with load_lock:
+            with self._lock:
+                entry = self._touch(name)
+                if entry is not None:
+                    return entry.model
+                self._make_room(estimate_model_size_mb(name))
+
+            entry = self._load(name)
+
+            with self._lock:
+                self._models[name] = entry
+                self._make_room(0, keep=name)
+            return entry.model
+
+    def is_loaded(self, name=None):
+        """Check whether a model is currently resident"""
+        with self._lock:
+            return (name or self.default_key) in self._models
+
+    def is_mock(self, name=None):
+        """Check whether the resident model is the mock fallback"""
+        with self._lock:
+            entry = self._models.get(name or self.default_key)
+            return entry is not None and entry.is_mock
+
+    def unload(self, name):
+        """Drop a model from the registry"""
+        with self._lock:
+            return self._models.pop(name, None) is not None
+
+    def resident_mb(self):
+        """Total measured size of resident models"""
+        with self._lock:
+            return sum(entry.size_mb for entry in self._models.values())
+
+    def status(self):
+        """Summary of resident models for health and diagnostics endpoints"""
+        with self._lock:
+            return {
+                'default_model': self.default_model,
+                'default_precision': self.default_precision,
+                'available_models': sorted(self.allowed_models),
+                'precisions': list(PRECISIONS),
+                'memory_budget_mb': self.memory_budget_mb,
+                'resident_mb': round(sum(e.size_mb for e in self._models.values()), 1),
+                'evictions': self.evictions,
+                'loaded_models': [
+                    {
+                        'name': entry.name,
+                        'size_mb': round(entry.size_mb, 1),
+                        'load_seconds': round(entry.load_seconds, 2),
+                        'mock': entry.is_mock,
+                    }
+                    for entry in self._models.values()
+                ],
+            }
+
+    def _touch(self, name):
+        entry = self._models.get(name)
+        if entry is not None:
+            entry.last_used = time.time()
+            self._models.move_to_end(name)
+        return entry
+
+    def _make_room(self, incoming_mb, keep=None):
+        """Evict least recently used models until ``incoming_mb`` fits the budget"""
+        resident = sum(entry.size_mb for entry in self._models.values())
+        for name in list(self._models):
+            if resident + incoming_mb <= self.memory_budget_mb:
+                break
+            if name == keep:
+                continue
+            entry = self._models.pop(name)
+            resident -= entry.size_mb
+            self.evictions += 1
+            print(f"Evicted Whisper model '{name}' ({entry.size_mb:.0f} MB) to stay within memory budget")
+
+    def _load(self, key):
+        started = time.time()
+        name, precision = split_model_key(key)
+        if self.fake_rtf is not None:
+            print(f"Using simulated Whisper model for '{key}' (RTF {self.fake_rtf})")
+            model = FakeWhisperModel(self.fake_rtf, self.fake_overhead_seconds)
+            return ModelEntry(key, model, 0.0, time.time() - started)
+        try:
+            import whisper
+            print(f"Loading Whisper model '{key}'...")
+            if precision == 'int8':
+                # Dynamic quantization kernels are CPU-only
+                model = quantize_int8(whisper.load_model(name, device='cpu'))
+            else:
+                model = whisper.load_model(name, device=self.device)
+            print(f"Whisper model '{key}' loaded successfully!")
+        except Exception as e:
+            print(f"Failed to load Whisper model '{key}': {e}")
+            print("Using mock model for testing...")
+            model = MockWhisperModel()
+        return ModelEntry(key, model, measure_model_size_mb(model), time.time() - started)
@@ -0,0 +1,235 @@
+"""
+Session-keyed server-side audio recording
+
+Each call to /start-recording opens its own session with its own input stream
+and thread-safe sample buffer, so several users can record at once. Sessions
+that have not been touched for ``idle_timeout`` seconds are closed by a
+background reaper, and the number of concurrent sessions is capped.
+
+Captured blocks are copied into a preallocated ring buffer, so the PortAudio
+callback neither allocates nor prints. If a recording outlasts the buffer,
+the oldest audio is overwritten and counted as overrun; blocks PortAudio
+reports as lost are counted as drops.
+"""
+
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE, resample
+
+
+class SessionLimitError(Exception):
+    """Raised when the maximum number of concurrent recordings is reached"""
+
+
+class SessionNotFoundError(KeyError):
+    """Raised for unknown or expired session IDs"""
+
+
+class RecordingSession:
+    """One user's recording: an input stream and a ring buffer of the samples it has captured"""
+
+    def __init__(self, samplerate, channels, max_seconds=300, client_session_id=None):
+        self.id = uuid.uuid4().hex
+        # The caller's own session, whose remembered language applies to this recording
+        self.client_session_id = client_session_id
+        self.samplerate = samplerate
+        self.channels = channels
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.stream = None
+        # np.zeros maps zero pages lazily: memory is only committed as audio arrives
+        self._buffer = np.zeros((max(1, int(max_seconds * samplerate)), channels), dtype=np.float32)
+        self._frames = 0
+        self.overrun_frames = 0
+        self.dropped_blocks = 0
+        self._lock = threading.Lock()
+
+    def callback(self, indata, frames, time_info, status):
+        """sounddevice callback, invoked on the PortAudio thread; copies the block into the ring"""
+        if status and status.input_overflow:
+            self.dropped_blocks += 1
+        capacity = len(self._buffer)
+        if frames > capacity:
+            indata = indata[frames - capacity:]
+        with self._lock:
+            start = (self._frames + frames - len(indata)) % capacity
+            first = min(len(indata), capacity - start)
+            self._buffer[start:start + first] = indata[:first]
+            self._buffer[:len(indata) - first] = indata[first:]
+            self.overrun_frames += max(0, self._frames + frames - capacity) - max(0, self._frames - capacity)
+            self._frames += frames
+
+    @property
+    def frames(self):
+        """Frames captured so far, including any the ring has since overwritten"""
+        with self._lock:
+            return self._frames
+
+    @property
+    def is_mock(self):
+        return self.stream is None
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def close(self):
+        if self.stream is not None:
+            try:
+                self.stream.stop()
+                self.stream.close()
+            except Exception as e:
+                print(f"Error stopping stream: {e}")
+            finally:
+                self.stream = None
+
+    def audio(self):
+        """The retained samples in order as 16 kHz mono float32, ready for the model; None if nothing was captured"""
+        with self._lock:
+            if not self._frames:
+                return None
+            capacity = len(self._buffer)
+            start = self._frames % capacity
+            if self._frames <= capacity:
+                frames = self._buffer[:self._frames]
+            else:
+                frames = np.concatenate((self._buffer[start:], self._buffer[:start]))
+            if self.channels == 1:
+                audio = frames[:, 0].copy()
+            else:
+                audio = frames.mean(axis=1, dtype=np.float32)
+        return resample(audio, self.samplerate, SAMPLE_RATE)
+
+    def status(self):
+        return {
+            'session_id': self.id,
+            'is_recording': True,
+            'recording_length': self.frames,
+            'duration': self.frames / float(self.samplerate),
+            'started_at': self.created_at,
+            'mock': self.is_mock,
+            'overrun_frames': self.overrun_frames,
+            'dropped_blocks': self.dropped_blocks,
+        }
+
+
+class RecordingManager:
+    """Creates, tracks and expires recording sessions"""
+
+    def __init__(self, samplerate=16000, channels=1, max_sessions=8, idle_timeout=300, max_seconds=300):
+        self.samplerate = samplerate
+        self.channels = channels
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout
+        self.max_seconds = max_seconds
+        self.expired = 0
+        # Overruns and drops of closed sessions; open sessions are added in capture_stats()
+        self._overrun_frames = 0
+        self._dropped_blocks = 0
+        self._sessions = {}
+        self._lock = threading.Lock()
+        self._reaper = threading.Thread(target=self._reap_loop, name='recording-reaper', daemon=True)
+        self._reaper.start()
+
+    def start(self, client_session_id=None):
+        """Open a new session and start capturing into it"""
+        self.expire_idle()
+        session = RecordingSession(self.samplerate, self.channels, self.max_seconds, client_session_id)
+        with self._lock:
+            if len(self._sessions) >= self.max_sessions:
+                raise SessionLimitError(f"Maximum of {self.max_sessions} concurrent recordings reached")
+            self._sessions[session.id] = session
+
+        # Start recording (with fallback)
+        try:
+            # Imported here so hosts without PortAudio still serve uploads (and mock recordings)
+            import sounddevice as sd
+            print(f"Starting audio recording at {self.samplerate}Hz for session {session.id[:8]}...")
+            stream = sd.InputStream(
+                samplerate=self.samplerate,
+                channels=self.channels,
+                callback=session.callback,
+                dtype='float32',
+                blocksize=1024
+            )
+            stream.start()
+            session.stream = stream
+            print("Real audio recording started successfully")
+        except Exception as audio_error:
+            print(f"Audio recording error: {audio_error}")
+            print("Using mock audio recording...")
+        return session
+
+    def get(self, session_id):
+        with self._lock:
+            session = self._sessions.get(session_id)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        session.touch()
+        return session
+
+    def stop(self, session_id):
+        """Close a session's stream and remove it; returns the session with its audio"""
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+        if session is None:
+            raise SessionNotFoundError(session_id)
+        session.close()
+        self._retire(session)
+        return session
+
+    def expire_idle(self):
+        """Close sessions that have not been touched within the idle timeout"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            stale = [s for s in self._sessions.values() if s.last_active < cutoff]
+            for session in stale:
+                del self._sessions[session.id]
+        for session in stale:
+            print(f"Expiring idle recording session {session.id[:8]}")
+            session.close()
+            self._retire(session)
+            self.expired += 1
+        return len(stale)
+
+    def _retire(self, session):
+        with self._lock:
+            self._overrun_frames += session.overrun_frames
+            self._dropped_blocks += session.dropped_blocks
+            if session.overrun_frames:
+                print(f"Recording session {session.id[:8]} overran its {self.max_seconds}s buffer; "
+                      f"the first {session.overrun_frames / self.samplerate:.1f}s were discarded")
+
+    def capture_stats(self):
+        """Total overrun frames and dropped blocks across all sessions, open and closed"""
+        with self._lock:
+            sessions = list(self._sessions.values())
+            overrun, dropped = self._overrun_frames, self._dropped_blocks
+        return {
+            'overrun_frames': overrun + sum(s.overrun_frames for s in sessions),
+            'dropped_blocks': dropped + sum(s.dropped_blocks for s in sessions),
+        }
+
+    def status(self):
+        with self._lock:
+            active = len(self._sessions)
+        return {
+            'is_recording': active > 0,
+            'recording_length': 0,
+            'active_sessions': active,
+            'max_sessions': self.max_sessions,
+            'max_seconds': self.max_seconds,
+            'expired_sessions': self.expired,
+            **self.capture_stats(),
+        }
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(min(30, self.idle_timeout))
+            try:
+                self.expire_idle()
+            except Exception as e:
+                print(f"Error expiring recording sessions: {e}")
@@ -13,16 +13,32 @@ def check_dependencies():
     try:
         import flask
         import whisper
-        import librosa
-        import sounddevice
         import scipy
         import numpy
-        print("✓ All dependencies are installed")
-        return True
     except ImportError as e:
         print(f"✗ Missing dependency: {e}")
         print("Please run: pip install -r requirements.txt")
         return False
+    print("✓ All required dependencies are installed")
+    
+    # Only live microphone recording needs PortAudio; uploads and streams work without it
+    try:
+        import sounddevice
+    except (ImportError, OSError) as e:
+        print(f"⚠️  sounddevice unavailable ({e}); /start-recording will use mock audio")
+    return True
+
+def production_command():
+    """Gunicorn command for production serving, or None when it cannot be used here"""
+    if sys.platform == 'win32':
+        print("⚠️  Gunicorn does not run on Windows; falling back to the development server")
+        return None
+    try:
+        import gunicorn
+    except ImportError:
+        print("⚠️  Gunicorn is not installed; falling back to the development server")
+        return None
+    return [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:app']
 
 def main():
     print("🎤 Speech-to-Text Backend Startup")
@@ -32,18 +48,27 @@ def main():
     if not check_dependencies():
         sys.exit(1)
     
+    production = '--production' in sys.argv or os.environ.get('FLASK_ENV') == 'production'
+    command = production_command() if production else None
+    
     # Set environment variables
-    os.environ['FLASK_ENV'] = 'development'
-    os.environ['FLASK_DEBUG'] = '1'
+    if command:
+        os.environ['FLASK_ENV'] = 'production'
+        os.environ['FLASK_DEBUG'] = '0'
+        print("🚀 Starting production server (gunicorn)...")
+    else:
+        os.environ['FLASK_ENV'] = 'development'
+        os.environ['FLASK_DEBUG'] = '1'
+        command = [sys.executable, 'app.py']
+        print("🚀 Starting Flask server...")
     
-    print("🚀 Starting Flask server...")
     print("📡 Server will be available at: http://localhost:5000")
     print("🔗 Health check: http://localhost:5000/health")
     print("=" * 40)
     
     try:
-        # Start the Flask app
-        subprocess.run([sys.executable, 'app.py'], check=True)
+        # Start the server from the backend directory so app.py and gunicorn.conf.py resolve
+        subprocess.run(command, check=True, cwd=os.path.dirname(os.path.abspath(__file__)))
     except KeyboardInterrupt:
         print("\n👋 Shutting down server...")
     except Exception as e:
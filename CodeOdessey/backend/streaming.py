@@ -0,0 +1,309 @@
+"""
+Live streaming transcription over chunked HTTP
+
+Clients open a stream, POST raw PCM chunks while the user speaks and finish
+the stream when they stop. Each stream keeps a sliding window of audio that
+has not been finalized yet. Whenever enough new audio has arrived, the window
+is re-transcribed in the background; segments that two consecutive passes
+agree on and that end safely before the live edge are committed, their audio
+is dropped from the window and their text is carried forward as the prompt
+for the next pass. A window that reaches ``max_window_seconds`` is committed
+as it stands, and audio it found no speech in is dropped, so passes never
+grow beyond that length. When the stream is finished, only the short uncommitted
+tail is left to transcribe.
+"""
+
+import threading
+import time
+import uuid
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+from recording import SessionLimitError, SessionNotFoundError
+
+
+def pcm_chunk_to_float32(data, sample_format='s16le'):
+    """Convert a raw PCM chunk (16-bit or float32, little-endian, mono) to float32 samples"""
+    if sample_format == 's16le':
+        return np.frombuffer(data, '<i2').astype(np.float32) / 32768.0
+    if sample_format == 'f32le':
+        return np.frombuffer(data, '<f4').astype(np.float32)
+    raise ValueError(f"Unsupported sample format '{sample_format}', use s16le or f32le")
+
+
+class StreamingSession:
+    """Incremental transcription state for one live stream"""
+
+    def __init__(self, submit, model_name, step_seconds=1.0, stability_margin=1.0,
+                 max_window_seconds=20.0, prompt_chars=200, language=None, language_lock_seconds=2.0,
+                 timeout=300):
+        self.id = uuid.uuid4().hex
+        self.model_name = model_name
+        self.step_seconds = step_seconds
+        self.stability_margin = stability_margin
+        self.max_window_seconds = max_window_seconds
+        self.prompt_chars = prompt_chars
+        self.created_at = time.time()
+        self.last_active = self.created_at
+        self.segments = []
+        self.partial = ''
+        self.decodes = 0
+        # A hinted language is fixed; otherwise the first confident detection is
+        # reused so later passes over the window skip language detection
+        self.language = language
+        self.language_locked = language is not None
+        self.language_lock_seconds = language_lock_seconds
+        self.timeout = timeout
+        self._submit = submit
+        self._audio = np.zeros(0, dtype=np.float32)
+        self._offset = 0
+        self._received = 0
+        self._decoded_upto = 0
+        self._previous = []
+        self._pending = None
+        self._finishing = False
+        self._closed = False
+        # Re-entrant: a decode that completes immediately runs its callback under the caller's lock
+        self._lock = threading.RLock()
+
+    @property
+    def committed_text(self):
+        return ' '.join(s['text'] for s in self.segments).strip()
+
+    def touch(self):
+        self.last_active = time.time()
+
+    def feed(self, samples):
+        """Append samples and start a background decode when enough new audio has arrived"""
+        with self._lock:
+            self.touch()
+            self._audio = np.concatenate([self._audio, samples])
+            self._received += len(samples)
+            new_audio = self._received - self._decoded_upto
+            if self._pending is None and new_audio >= self.step_seconds * SAMPLE_RATE:
+                self._start_decode()
+            return self.snapshot()
+
+    def finish(self):
+        """Wait for any running pass, transcribe the remaining tail and commit everything
+
+        The final pass runs outside the session lock, so concurrent status
+        calls are not held up by inference. Raises QueueFullError, the
+        inference error, or TimeoutError after ``timeout`` seconds; the
+        session is closed either way.
+        """
+        with self._lock:
+            self._finishing = True
+            pending = self._pending
+        try:
+            if pending is not None:
+                try:
+                    pending.result(timeout=self.timeout)
+                except Exception as e:
+                    print(f"Streaming decode failed: {e}")
+            with self._lock:
+                window = self._audio
+                options = self._decode_options()
+            if len(window) >= 0.1 * SAMPLE_RATE:
+                result = self._submit(self.model_name, window, options).result(timeout=self.timeout)
+                with self._lock:
+                    self.decodes += 1
+                    self._update_language(result, len(window))
+                    segments = self._segments_of(result, len(window))
+                    if segments:
+                        self._commit(segments)
+        finally:
+            with self._lock:
+                self._audio = self._audio[:0]
+                self._previous = []
+                self.partial = ''
+                self._closed = True
+        with self._lock:
+            return self.snapshot(final=True)
+
+    def close(self):
+        """Drop the session's audio without transcribing it; a running pass is ignored"""
+        with self._lock:
+            self._audio = self._audio[:0]
+            self._previous = []
+            self._closed = True
+
+    def snapshot(self, final=False):
+        return {
+            'stream_id': self.id,
+            'status': 'final' if final else 'streaming',
+            'committed': self.committed_text,
+            'partial': self.partial,
+            'segments': list(self.segments),
+            'language': self.language,
+            'received_seconds': self._received / float(SAMPLE_RATE),
+            'pending_seconds': len(self._audio) / float(SAMPLE_RATE),
+            'decodes': self.decodes,
+        }
+
+    def _update_language(self, result, window_samples):
+        if self.language_locked or result.get('language') in (None, 'unknown'):
+            return
+        self.language = result['language']
+        # Detection on a second or less of audio is unreliable; keep detecting until the window is longer
+        if window_samples >= self.language_lock_seconds * SAMPLE_RATE:
+            self.language_locked = True
+
+    def _decode_options(self):
+        options = {'temperature': 0.0, 'condition_on_previous_text': False}
+        if self.language_locked:
+            options['language'] = self.language
+        prompt = self.committed_text[-self.prompt_chars:]
+        if prompt:
+            options['initial_prompt'] = prompt
+        return options
+
+    def _start_decode(self):
+        window = self._audio
+        try:
+            self._pending = self._submit(self.model_name, window, self._decode_options())
+        except Exception as e:
+            # Busy workers only delay partial results; the next chunk retries
+            print(f"Could not schedule streaming decode: {e}")
+            return
+        self._decoded_upto = self._received
+        self._pending.add_done_callback(lambda f: self._on_decoded(f, len(window)))
+
+    def _on_decoded(self, future, window_samples):
+        with self._lock:
+            self._pending = None
+            if self._finishing or self._closed:
+                # finish() transcribes this window's audio itself; the callback can
+                # run after finish() has already taken the final window
+                return
+            if future.exception() is not None:
+                print(f"Streaming decode failed: {future.exception()}")
+                return
+            result = future.result()
+            self.decodes += 1
+            self._update_language(result, window_samples)
+            segments = self._segments_of(result, window_samples)
+
+            window_seconds = window_samples / float(SAMPLE_RATE)
+            stable_until = window_seconds - self.stability_margin
+            force = window_seconds >= self.max_window_seconds
+            if force:
+                # The window reached its limit: commit everything this pass produced,
+                # even at the live edge, so the window cannot keep growing
+                stable = segments
+            else:
+                stable = []
+                # The last segment may be cut mid-word at the live edge, so it is never committed early
+                for i, segment in enumerate(segments[:-1]):
+                    agreed = i < len(self._previous) and self._previous[i]['text'] == segment['text']
+                    if segment['end'] > stable_until or not agreed:
+                        break
+                    stable.append(segment)
+
+            window_start = self._offset
+            if stable:
+                self._commit(stable)
+            if force:
+                # Audio the pass found no speech in is dropped as well, up to the live edge
+                self._drop_until(window_start + max(int(stable_until * SAMPLE_RATE), 0))
+            remaining = segments[len(stable):]
+            self._previous = remaining
+            self.partial = ' '.join(s['text'] for s in remaining).strip()
+
+            # Audio kept arriving while this pass ran; keep up if another step is due
+            due = self._received - self._decoded_upto >= self.step_seconds * SAMPLE_RATE
+            if due and not self._finishing:
+                self._start_decode()
+
+    def _commit(self, segments):
+        """Finalize segments, shift them to stream time and drop their audio from the window"""
+        offset_seconds = self._offset / float(SAMPLE_RATE)
+        for segment in segments:
+            self.segments.append({
+                'start': round(segment['start'] + offset_seconds, 2),
+                'end': round(segment['end'] + offset_seconds, 2),
+                'text': segment['text'],
+            })
+        self._drop_until(self._offset + int(segments[-1]['end'] * SAMPLE_RATE))
+
+    def _drop_until(self, position):
+        """Drop window audio before ``position`` (in samples since the stream started)"""
+        cut = min(max(position - self._offset, 0), len(self._audio))
+        self._audio = self._audio[cut:]
+        self._offset += cut
+
+    @staticmethod
+    def _segments_of(result, window_samples):
+        segments = [
+            {'start': s['start'], 'end': s['end'], 'text': s['text'].strip()}
+            for s in result.get('segments', []) if s['text'].strip()
+        ]
+        if not segments and result.get('text'):
+            segments = [{'start': 0.0, 'end': window_samples / float(SAMPLE_RATE), 'text': result['text'].strip()}]
+        return segments
+
+
+class StreamManager:
+    """Tracks live streams, capping their number and expiring abandoned ones"""
+
+    def __init__(self, submit, max_streams=8, idle_timeout=60, **session_options):
+        self.submit = submit
+        self.max_streams = max_streams
+        self.idle_timeout = idle_timeout
+        self.session_options = session_options
+        self.expired = 0
+        self._streams = {}
+        self._lock = threading.Lock()
+        self._reaper = threading.Thread(target=self._reap_loop, name='stream-reaper', daemon=True)
+        self._reaper.start()
+
+    def open(self, model_name, language=None):
+        self.expire_idle()
+        session = StreamingSession(self.submit, model_name, language=language, **self.session_options)
+        with self._lock:
+            if len(self._streams) >= self.max_streams:
+                raise SessionLimitError(f"Maximum of {self.max_streams} concurrent streams reached")
+            self._streams[session.id] = session
+        return session
+
+    def get(self, stream_id):
+        with self._lock:
+            session = self._streams.get(stream_id)
+        if session is None:
+            raise SessionNotFoundError(stream_id)
+        session.touch()
+        return session
+
+    def close(self, stream_id):
+        with self._lock:
+            session = self._streams.pop(stream_id, None)
+        if session is None:
+            raise SessionNotFoundError(stream_id)
+        return session
+
+    def expire_idle(self):
+        """Drop streams that have received no chunks within the idle timeout"""
+        cutoff = time.time() - self.idle_timeout
+        with self._lock:
+            stale = [s for s in self._streams.values() if s.last_active < cutoff]
+            for session in stale:
+                del self._streams[session.id]
+        for session in stale:
+            print(f"Expiring idle stream {session.id[:8]}")
+            session.close()
+            self.expired += 1
+        return len(stale)
+
+    def status(self):
+        with self._lock:
+            return {'active_streams': len(self._streams), 'max_streams': self.max_streams,
+                    'expired_streams': self.expired}
+
+    def _reap_loop(self):
+        while True:
+            time.sleep(min(30, self.idle_timeout))
+            try:
+                self.expire_idle()
+            except Exception as e:
+                print(f"Error expiring streams: {e}")
@@ -9,6 +9,9 @@ import json
 
 BASE_URL = "http://localhost:5000"
 
+# Session ID returned by /start-recording, used by the stop test
+session_id = None
+
 def test_health():
     """Test health check endpoint"""
     print("🔍 Testing health check...")
@@ -46,11 +49,13 @@ def test_recording_status():
 
 def test_start_recording():
     """Test start recording endpoint"""
+    global session_id
     print("🔍 Testing start recording...")
     try:
         response = requests.post(f"{BASE_URL}/start-recording")
         if response.status_code == 200:
             data = response.json()
+            session_id = data.get('session_id')
             print(f"✅ Start recording: {data}")
             return True
         else:
@@ -64,7 +69,7 @@ def test_stop_recording():
     """Test stop recording endpoint"""
     print("🔍 Testing stop recording...")
     try:
-        response = requests.post(f"{BASE_URL}/stop-recording")
+        response = requests.post(f"{BASE_URL}/stop-recording", json={'session_id': session_id})
         if response.status_code == 200:
             data = response.json()
             print(f"✅ Stop recording: {data}")
@@ -109,7 +114,8 @@ def main():
     print("\n💡 To test with actual audio:")
     print("   1. Start recording: curl -X POST http://localhost:5000/start-recording")
     print("   2. Speak into your microphone")
-    print("   3. Stop recording: curl -X POST http://localhost:5000/stop-recording")
+    print("   3. Stop recording: curl -X POST -H 'Content-Type: application/json' \\")
+    print("        -d '{\"session_id\": \"<id from step 1>\"}' http://localhost:5000/stop-recording")
 
 if __name__ == "__main__":
     main()
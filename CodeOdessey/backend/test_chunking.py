@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import Future
+
+import numpy as np
+
+from chunking import split_at_silence, transcribe_long
+from inference import InferencePool
+from model_registry import ModelRegistry
+
+SAMPLE_RATE = 16000
+
+
+def speech_like(seconds, seed=0):
+    """Noise with no pauses, so the recording is cut into fixed-length chunks"""
+    rng = np.random.default_rng(seed)
+    return (rng.standard_normal(int(seconds * SAMPLE_RATE)) * 0.1).astype(np.float32)
+
+
+def test_long_recording_does_not_fill_queue():
+    """A recording with more chunks than inference queue slots is transcribed, not rejected"""
+    audio = speech_like(600)
+    chunks = len(split_at_silence(audio, chunk_seconds=28.0))
+    assert chunks > 16, f"expected more than 16 chunks, got {chunks}"
+
+    # The fake engine simulates inference time without model weights
+    registry = ModelRegistry(default_model='tiny', fake_rtf=0.001, fake_overhead_seconds=0.0)
+    pool = InferencePool(registry, workers=0, queue_size=16, warmup=False)
+    pool.start()
+    try:
+        result = transcribe_long(pool.submit_transcription, 'tiny', audio, timeout=60,
+                                 max_in_flight=max(pool.workers, 1), chunk_seconds=28.0)
+    finally:
+        pool.shutdown()
+
+    assert result['chunks'] == chunks
+    assert pool.rejected == 0
+    assert pool.completed == chunks
+    print(f"✅ {chunks} chunks transcribed through a 16-slot queue")
+
+
+def test_failed_chunk_cancels_the_rest():
+    """When one chunk fails, chunks that have not started are cancelled and the error is raised"""
+    audio = speech_like(300)
+    submitted = []
+
+    def submit(model_name, chunk, options):
+        future = Future()
+        submitted.append(future)
+        if len(submitted) == 2:
+            future.set_exception(RuntimeError('worker crashed'))
+        return future
+
+    try:
+        transcribe_long(submit, 'tiny', audio, timeout=5, max_in_flight=4, chunk_seconds=28.0)
+    except RuntimeError as e:
+        assert str(e) == 'worker crashed'
+    else:
+        raise AssertionError('the chunk failure was not raised')
+
+    assert len(submitted) == 4, f"only the first batch of chunks should be submitted, got {len(submitted)}"
+    assert sum(f.cancelled() for f in submitted) == 3
+    print("✅ Remaining chunks cancelled after a failure")
+
+
+if __name__ == "__main__":
+    test_long_recording_does_not_fill_queue()
+    test_failed_chunk_cancels_the_rest()
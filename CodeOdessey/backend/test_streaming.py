@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+
+from concurrent.futures import Future
+
+import numpy as np
+
+from streaming import StreamingSession, StreamManager
+
+SAMPLE_RATE = 16000
+
+
+class HeldCallbackFuture(Future):
+    """Future whose done-callbacks only run when ``release()`` is called"""
+
+    def __init__(self):
+        super().__init__()
+        self.held = []
+
+    def add_done_callback(self, fn):
+        self.held.append(fn)
+
+    def release(self):
+        for fn in self.held:
+            fn(self)
+
+
+def words_result(seconds, first=0):
+    """A decode result with one one-second segment per word"""
+    return {
+        'text': ' '.join(f'w{first + i}' for i in range(int(seconds))),
+        'language': 'en',
+        'segments': [
+            {'start': float(i), 'end': float(i + 1), 'text': f'w{first + i}'}
+            for i in range(int(seconds))
+        ],
+    }
+
+
+def test_late_callback_does_not_duplicate_segments():
+    """A decode callback that runs after finish() took the final window commits nothing"""
+    submitted = []
+
+    def submit(model_name, audio, options):
+        future = HeldCallbackFuture()
+        submitted.append((future, len(audio)))
+        return future
+
+    session = StreamingSession(submit, 'tiny', step_seconds=1.0, stability_margin=1.0, max_window_seconds=5.0)
+    session.feed(np.zeros(5 * SAMPLE_RATE, dtype=np.float32))
+    pending, _ = submitted[0]
+    # The running pass finishes, but its callback has not run yet
+    pending.set_result(words_result(5))
+
+    def final_submit(model_name, audio, options):
+        # The callback runs while the final pass is being scheduled, after the window was taken
+        pending.release()
+        final = Future()
+        final.set_result(words_result(len(audio) // SAMPLE_RATE))
+        return final
+
+    session._submit = final_submit
+    snapshot = session.finish()
+
+    texts = [s['text'] for s in session.segments]
+    assert texts == ['w0', 'w1', 'w2', 'w3', 'w4'], texts
+    assert snapshot['committed'] == 'w0 w1 w2 w3 w4'
+    print("✅ Late decode callback ignored after finish")
+
+
+def done(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+def test_window_limit_without_speech():
+    """A window that reaches the limit is trimmed even when no segment can be committed"""
+    results = []
+
+    def submit(model_name, audio, options):
+        return done(results.pop(0) if results else {'text': '', 'segments': []})
+
+    session = StreamingSession(submit, 'tiny', step_seconds=1.0, stability_margin=1.0, max_window_seconds=5.0)
+    for _ in range(12):
+        snapshot = session.feed(np.zeros(SAMPLE_RATE, dtype=np.float32))
+        assert snapshot['pending_seconds'] <= 5.0, snapshot
+    assert session.segments == []
+
+    # A single segment covering the whole window is committed once the window is full
+    session = StreamingSession(submit, 'tiny', step_seconds=5.0, stability_margin=1.0, max_window_seconds=5.0)
+    results.append({'text': 'hello', 'language': 'en', 'segments': [{'start': 0.0, 'end': 5.0, 'text': 'hello'}]})
+    snapshot = session.feed(np.zeros(5 * SAMPLE_RATE, dtype=np.float32))
+    assert snapshot['committed'] == 'hello', snapshot
+    assert snapshot['pending_seconds'] == 0.0, snapshot
+    print("✅ Stream window stays within max_window_seconds")
+
+
+def test_idle_streams_expire():
+    """Streams without chunks are expired; fetching a stream keeps it alive"""
+    manager = StreamManager(lambda *args: Future(), idle_timeout=60)
+    idle = manager.open('tiny')
+    active = manager.open('tiny')
+    idle.last_active -= 120
+    active.last_active -= 120
+    manager.get(active.id)
+
+    assert manager.expire_idle() == 1
+    assert manager.status()['active_streams'] == 1
+    manager.get(active.id)
+    print("✅ Idle streams expire")
+
+
+if __name__ == "__main__":
+    test_late_callback_does_not_duplicate_segments()
+    test_window_limit_without_speech()
+    test_idle_streams_expire()
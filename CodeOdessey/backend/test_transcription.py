@@ -46,5 +46,41 @@ def test_whisper_transcription():
         print(f"❌ Whisper transcription test failed: {e}")
         return False
 
+def test_language_detection_matches_whisper():
+    """Test that instrumented inference detects the same language as stock Whisper"""
+    try:
+        from whisper.audio import N_FRAMES, N_SAMPLES
+        from inference import InferencePool
+        from model_registry import ModelRegistry
+        
+        model_name = os.environ.get('WHISPER_TEST_MODEL', 'tiny')
+        print(f"Starting inline inference worker with '{model_name}'...")
+        registry = ModelRegistry(default_model=model_name, allowed_models=[model_name])
+        pool = InferencePool(registry, workers=0, warmup=False)
+        pool.start()
+        stock = whisper.load_model(model_name, device='cpu')
+        
+        for seconds in (4, 12, 45):
+            audio = (np.random.default_rng(seconds).standard_normal(seconds * 16000) * 0.1).astype(np.float32)
+            # Upstream transcribe() detects on the first 30 s of the silence-padded spectrogram
+            mel = whisper.log_mel_spectrogram(audio, stock.dims.n_mels, padding=N_SAMPLES)
+            _, probs = stock.detect_language(whisper.pad_or_trim(mel, N_FRAMES))
+            expected = max(probs, key=probs.get)
+            
+            result = pool.transcribe(model_name, audio, {'temperature': 0.0})
+            print(f"{seconds}s: language {result['language']} (stock {expected}), encoder reuses: {result['encoder_reuses']}")
+            assert result['language'] == expected, f"{seconds}s clip detected as {result['language']}, stock Whisper says {expected}"
+            if seconds >= 30:
+                # The detection window is the first decode window, so decoding reuses its encoding
+                assert result['encoder_reuses'] >= 1, "language detection pass was not reused by the first decode"
+        pool.shutdown()
+        print("✅ Language detection parity test successful!")
+        return True
+        
+    except Exception as e:
+        print(f"❌ Language detection parity test failed: {e}")
+        return False
+
 if __name__ == "__main__":
     test_whisper_transcription()
+    test_language_detection_matches_whisper()
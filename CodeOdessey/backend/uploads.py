@@ -0,0 +1,198 @@
+"""
+Streamed multipart uploads
+
+Flask normally parses a multipart body completely, buffering the file part
+in memory or a temporary file, before the view runs. Here the request body
+is read in fixed-size chunks and each audio part is handed to its own
+StreamingDecoder while it arrives, so per-request buffering stays constant
+regardless of file size and decoding overlaps with the network transfer.
+Size and duration limits are enforced as the bytes come in.
+"""
+
+import hashlib
+
+from werkzeug.http import parse_options_header
+from werkzeug.sansio.multipart import Data, Epilogue, Field, File, MultipartDecoder, NeedData
+
+from audio_io import AudioDecodeError, StreamingDecoder, SAMPLE_RATE
+
+# Form fields (model, language, ...) are tiny; anything larger is not a valid request
+MAX_FIELD_BYTES = 64 * 1024
+
+# Marks a file part whose data is ignored (form field targets are their names)
+_SKIPPED_PART = object()
+
+
+class UploadError(Exception):
+    """Raised when a request body is not a usable audio upload"""
+
+
+class UploadTooLargeError(UploadError):
+    """Raised when an upload exceeds the maximum accepted size"""
+
+
+class StreamedUpload:
+    """One received audio file: its metadata and the running decode"""
+
+    def __init__(self, decoder, filename=''):
+        self.decoder = decoder
+        self.fields = {}
+        self.filename = filename
+        self.size = 0
+        self.digest = None
+        # Set when this file alone was refused (batch uploads keep reading the other files)
+        self.error = None
+        self._hasher = hashlib.sha256()
+
+    def feed(self, data):
+        self.size += len(data)
+        self._hasher.update(data)
+        self.decoder.feed(data)
+
+    def complete(self):
+        self.digest = self._hasher.hexdigest()
+
+    def audio(self):
+        """Finish decoding and return the 16 kHz float32 samples"""
+        if self.error is not None:
+            raise self.error
+        return self.decoder.finish()
+
+    def discard(self):
+        self.decoder.close()
+
+
+def receive_audio_upload(stream, content_type, field='audio', max_bytes=None, max_seconds=None,
+                         chunk_size=64 * 1024, sample_rate=SAMPLE_RATE):
+    """Read a multipart/form-data body from ``stream``, decoding the ``field`` file as it arrives
+
+    Returns a StreamedUpload whose ``filename`` is None when the body had no
+    such file; its ``fields`` holds the form fields. Raises
+    UploadTooLargeError past ``max_bytes`` and AudioTooLongError once more
+    than ``max_seconds`` of audio has decoded.
+    """
+    received = []
+
+    def open_file(filename):
+        # Only the first file in the audio field is decoded; other files are skipped
+        if received:
+            return None
+        received.append(StreamedUpload(StreamingDecoder(sample_rate, max_seconds), filename))
+        return received[0]
+
+    try:
+        fields = _read_multipart(stream, content_type, field, max_bytes, chunk_size, open_file)
+    except Exception:
+        for upload in received:
+            upload.discard()
+        raise
+    upload = received[0] if received else StreamedUpload(StreamingDecoder(sample_rate, max_seconds), None)
+    if upload.digest is None:
+        upload.complete()
+    upload.fields = fields
+    return upload
+
+
+def receive_audio_uploads(stream, content_type, field='audio', max_bytes=None, max_file_bytes=None,
+                          max_files=None, max_seconds=None, chunk_size=64 * 1024, sample_rate=SAMPLE_RATE):
+    """Read a multipart/form-data body, decoding every ``field`` file as it arrives
+
+    Returns ``(fields, uploads)``. The whole body is capped at ``max_bytes``
+    (UploadTooLargeError) and the number of files at ``max_files``
+    (UploadError). A file over ``max_file_bytes`` or ``max_seconds``, or one
+    that cannot be decoded, stops being read and gets its ``error`` set, so
+    it fails on its own without rejecting the rest of the batch.
+    """
+    uploads = []
+
+    def open_file(filename):
+        if max_files and len(uploads) >= max_files:
+            raise UploadError(f"At most {max_files} files per batch")
+        uploads.append(StreamedUpload(StreamingDecoder(sample_rate, max_seconds), filename))
+        return uploads[-1]
+
+    def on_error(upload, error):
+        upload.error = error
+        upload.discard()
+
+    try:
+        fields = _read_multipart(stream, content_type, field, max_bytes, chunk_size, open_file,
+                                 max_file_bytes, on_error)
+    except Exception:
+        for upload in uploads:
+            upload.discard()
+        raise
+    for upload in uploads:
+        if upload.digest is None:
+            upload.complete()
+    return fields, uploads
+
+
+def _read_multipart(stream, content_type, field, max_bytes, chunk_size, open_file,
+                    max_file_bytes=None, on_error=None):
+    """Parse a multipart body chunk by chunk, feeding ``field`` files to their uploads; returns the form fields
+
+    ``open_file(filename)`` is called at the start of each ``field`` file and
+    returns the StreamedUpload to feed, or None to skip the file. Without
+    ``on_error`` a file's decode or size error is raised; with it, the file
+    is handed to ``on_error(upload, error)`` and the rest of it is skipped.
+    """
+    mimetype, options = parse_options_header(content_type or '')
+    boundary = options.get('boundary')
+    if mimetype != 'multipart/form-data' or not boundary:
+        raise UploadError('No audio file provided (expected a multipart/form-data upload)')
+
+    parser = MultipartDecoder(boundary.encode('latin-1'))
+    fields = {}
+    target = None
+    field_value = []
+    field_bytes = 0
+    received = 0
+    finished = False
+    while not finished:
+        chunk = stream.read(chunk_size)
+        received += len(chunk)
+        if max_bytes and received > max_bytes:
+            raise UploadTooLargeError(f"Upload is larger than the {max_bytes // (1024 * 1024)} MB limit")
+        parser.receive_data(chunk or None)
+        event = parser.next_event()
+        while not isinstance(event, NeedData):
+            if isinstance(event, Epilogue):
+                finished = True
+                break
+            if isinstance(event, File):
+                target = open_file(event.filename or '') if event.name == field else None
+                if target is None:
+                    target = _SKIPPED_PART
+            elif isinstance(event, Field):
+                target = event.name
+                field_value = []
+                field_bytes = 0
+            elif isinstance(event, Data):
+                if isinstance(target, StreamedUpload):
+                    try:
+                        if max_file_bytes and target.size + len(event.data) > max_file_bytes:
+                            raise UploadTooLargeError(
+                                f"File is larger than the {max_file_bytes // (1024 * 1024)} MB limit")
+                        target.feed(event.data)
+                    except (UploadTooLargeError, AudioDecodeError) as e:
+                        if on_error is None:
+                            raise
+                        on_error(target, e)
+                        target = _SKIPPED_PART
+                    else:
+                        if not event.more_data:
+                            target.complete()
+                elif target is not _SKIPPED_PART and target is not None:
+                    field_value.append(event.data)
+                    field_bytes += len(event.data)
+                    if field_bytes > MAX_FIELD_BYTES:
+                        raise UploadTooLargeError(f"Form field '{target}' is too large")
+                    if not event.more_data:
+                        fields[target] = b''.join(field_value).decode('utf-8', errors='replace')
+            event = parser.next_event()
+        if not chunk:
+            break
+    if not finished:
+        raise UploadError('Upload ended before the multipart body was complete')
+    return fields
@@ -0,0 +1,109 @@
+"""
+Energy / zero-crossing voice-activity detection
+
+Runs on the decoded 16 kHz float32 samples before transcription. Frames are
+classified in one vectorized pass: a frame is speech when its energy clears an
+adaptive threshold, or when it is only slightly quieter but has the high
+zero-crossing rate of unvoiced consonants. The speech mask is padded so word
+edges are kept, and the speech regions are joined into a shorter clip. Clips
+with no speech at all are skipped entirely.
+"""
+
+import numpy as np
+
+from audio_io import SAMPLE_RATE
+
+
+class VadResult:
+    """Speech regions of a clip and the audio that remains after trimming"""
+
+    def __init__(self, audio, regions, total_samples, sample_rate=SAMPLE_RATE):
+        self.audio = audio
+        self.regions = regions
+        self.total_samples = total_samples
+        self.sample_rate = sample_rate
+
+    @property
+    def has_speech(self):
+        return bool(self.regions)
+
+    @property
+    def speech_seconds(self):
+        return len(self.audio) / float(self.sample_rate)
+
+    @property
+    def skipped_seconds(self):
+        return (self.total_samples - len(self.audio)) / float(self.sample_rate)
+
+    def to_original_time(self, seconds):
+        """Map a timestamp in the trimmed audio back to the original clip"""
+        sample = seconds * self.sample_rate
+        kept = 0
+        for start, end in self.regions:
+            length = end - start
+            if sample <= kept + length:
+                return (start + sample - kept) / float(self.sample_rate)
+            kept += length
+        return self.total_samples / float(self.sample_rate)
+
+    def summary(self):
+        return {
+            'speech_seconds': round(self.speech_seconds, 3),
+            'skipped_seconds': round(self.skipped_seconds, 3),
+            'speech_regions': len(self.regions),
+        }
+
+
+def frame_features(audio, frame_samples):
+    """Per-frame energy in dBFS and zero-crossing rate for non-overlapping frames"""
+    n_frames = len(audio) // frame_samples
+    frames = audio[:n_frames * frame_samples].reshape(n_frames, frame_samples)
+    energy_db = 10.0 * np.log10(np.mean(frames * frames, axis=1) + 1e-10)
+    signs = np.signbit(frames)
+    zcr = np.count_nonzero(signs[:, 1:] != signs[:, :-1], axis=1) / float(frame_samples - 1)
+    return energy_db, zcr
+
+
+def detect_speech(audio, sample_rate=SAMPLE_RATE, frame_ms=30, margin_db=10.0, floor_db=-50.0,
+                  dynamic_range_db=30.0, zcr_threshold=0.25, padding_ms=200, min_speech_ms=90):
+    """Return (start, end) sample ranges that contain speech"""
+    frame_samples = int(sample_rate * frame_ms / 1000)
+    if len(audio) < frame_samples:
+        return []
+    energy_db, zcr = frame_features(audio, frame_samples)
+
+    # Adaptive threshold: above the noise floor, but never so high that
+    # continuous speech (whose quietest frames are still speech) is dropped
+    noise_db = np.percentile(energy_db, 10)
+    threshold = max(floor_db, min(noise_db + margin_db, energy_db.max() - dynamic_range_db))
+    voiced = energy_db > threshold
+    unvoiced = (energy_db > threshold - 6.0) & (zcr > zcr_threshold) & (energy_db > floor_db)
+    speech = voiced | unvoiced
+
+    # Drop isolated blips shorter than min_speech_ms, then pad around what is left
+    min_frames = max(1, int(min_speech_ms / frame_ms))
+    if min_frames > 1:
+        run = np.convolve(speech.astype(np.int32), np.ones(min_frames, dtype=np.int32), 'same')
+        speech &= run >= min_frames // 2 + 1
+    pad = int(padding_ms / frame_ms)
+    if pad:
+        speech = np.convolve(speech.astype(np.int32), np.ones(2 * pad + 1, dtype=np.int32), 'same') > 0
+
+    edges = np.diff(np.concatenate(([0], speech.astype(np.int8), [0])))
+    starts = np.flatnonzero(edges == 1) * frame_samples
+    ends = np.minimum(np.flatnonzero(edges == -1) * frame_samples, len(audio))
+    # The partial frame at the end belongs to the last region if that region reaches it
+    if len(ends) and ends[-1] == len(speech) * frame_samples:
+        ends[-1] = len(audio)
+    return list(zip(starts.tolist(), ends.tolist()))
+
+
+def trim_silence(audio, sample_rate=SAMPLE_RATE, **options):
+    """Drop non-speech regions from a clip"""
+    regions = detect_speech(audio, sample_rate, **options)
+    if not regions:
+        return VadResult(audio[:0], [], len(audio), sample_rate)
+    if len(regions) == 1 and regions[0] == (0, len(audio)):
+        return VadResult(audio, regions, len(audio), sample_rate)
+    trimmed = np.concatenate([audio[start:end] for start, end in regions])
+    return VadResult(trimmed, regions, len(audio), sample_rate)
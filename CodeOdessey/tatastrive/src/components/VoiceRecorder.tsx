@@ -3,6 +3,7 @@
 import { useState, useRef, useCallback, useEffect } from 'react';
 import { VoiceInput } from '@/types/input';
 import { speechToTextService } from '@/services/speechToTextService';
+import { languageService } from '@/services/languageService';
 
 interface VoiceRecorderProps {
   onRecording: (voice: VoiceInput) => void;
@@ -84,7 +85,8 @@ export default function VoiceRecorder({ onRecording, onClose, sectionId }: Voice
     setIsTranscribing(true);
     try {
       console.log('Sending audio blob to backend for transcription...', audioBlob.size, 'bytes');
-      const result = await speechToTextService.transcribeFile(audioBlob);
+      // The selected language lets the backend skip language detection
+      const result = await speechToTextService.transcribeFile(audioBlob, languageService.getCurrentLanguage());
       console.log('Backend transcription result:', result);
       
       if (result.status === 'success' && result.transcription) {
@@ -8,13 +8,22 @@ export interface TranscriptionResult {
   error?: string;
 }
 
+export interface BatchFileResult extends TranscriptionResult {
+  index: number;
+  filename: string;
+}
+
 export interface RecordingStatus {
+  session_id?: string;
   is_recording: boolean;
   recording_length: number;
 }
 
 class SpeechToTextService {
   private baseUrl: string;
+  private sessionId: string | null = null;
+  // Stable per page load; the backend remembers the detected language under it
+  private clientSessionId: string = Math.random().toString(36).slice(2) + Date.now().toString(36);
 
   constructor() {
     this.baseUrl = SPEECH_TO_TEXT_API_URL;
@@ -54,6 +63,8 @@ class SpeechToTextService {
         throw new Error(errorData.error || 'Failed to start recording');
       }
 
+      const data = await response.json();
+      this.sessionId = data.session_id;
       return true;
     } catch (error) {
       console.error('Failed to start recording:', error);
@@ -63,15 +74,18 @@ class SpeechToTextService {
 
   /**
    * Stop recording and get transcription
+   * @param language Optional language code hint (e.g. 'en', 'hi'); skips language detection
    */
-  async stopRecording(): Promise<TranscriptionResult> {
+  async stopRecording(language?: string): Promise<TranscriptionResult> {
     try {
       const response = await fetch(`${this.baseUrl}/stop-recording`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
         },
+        body: JSON.stringify({ session_id: this.sessionId, language }),
       });
+      this.sessionId = null;
 
       const data = await response.json();
 
@@ -101,8 +115,9 @@ class SpeechToTextService {
 
   /**
    * Transcribe an uploaded audio file
+   * @param language Optional language code hint (e.g. 'en', 'hi'); skips language detection
    */
-  async transcribeFile(audioBlob: Blob): Promise<TranscriptionResult> {
+  async transcribeFile(audioBlob: Blob, language?: string): Promise<TranscriptionResult> {
     try {
       console.log('Creating FormData with audio blob:', audioBlob.size, 'bytes');
       console.log('Backend URL:', this.baseUrl);
@@ -117,6 +132,10 @@ class SpeechToTextService {
 
       const formData = new FormData();
       formData.append('audio', audioBlob, 'recording.wav');
+      formData.append('session_id', this.clientSessionId);
+      if (language) {
+        formData.append('language', language);
+      }
 
       console.log('Sending request to backend...', `${this.baseUrl}/transcribe-file`);
       const response = await fetch(`${this.baseUrl}/transcribe-file`, {
@@ -158,12 +177,69 @@ class SpeechToTextService {
     }
   }
 
+  /**
+   * Transcribe many audio files in one request; onResult fires as each file finishes
+   * @param language Optional language code hint applied to every file
+   */
+  async transcribeFiles(
+    files: File[],
+    onResult: (result: BatchFileResult) => void,
+    language?: string
+  ): Promise<BatchFileResult[]> {
+    const formData = new FormData();
+    files.forEach((file) => formData.append('audio', file, file.name));
+    formData.append('session_id', this.clientSessionId);
+    if (language) {
+      formData.append('language', language);
+    }
+
+    const response = await fetch(`${this.baseUrl}/transcribe-batch`, {
+      method: 'POST',
+      body: formData,
+    });
+    if (!response.ok || !response.body) {
+      const data = await response.json().catch(() => ({}));
+      throw new Error(data.error || 'Failed to transcribe audio files');
+    }
+
+    // The backend writes one JSON line per file as soon as it is transcribed
+    const results: BatchFileResult[] = [];
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffered = '';
+    for (;;) {
+      const { done, value } = await reader.read();
+      buffered += decoder.decode(value, { stream: !done });
+      const lines = buffered.split('\n');
+      buffered = lines.pop() || '';
+      for (const line of lines) {
+        if (!line.trim()) continue;
+        const data = JSON.parse(line);
+        if (data.index === undefined) continue; // closing summary line
+        const result: BatchFileResult = {
+          index: data.index,
+          filename: data.filename,
+          status: data.status === 'success' ? 'success' : 'error',
+          transcription: data.transcription,
+          language: data.language,
+          duration: data.duration,
+          error: data.error,
+        };
+        results.push(result);
+        onResult(result);
+      }
+      if (done) break;
+    }
+    return results;
+  }
+
   /**
    * Get current recording status
    */
   async getRecordingStatus(): Promise<RecordingStatus> {
     try {
-      const response = await fetch(`${this.baseUrl}/recording-status`);
+      const query = this.sessionId ? `?session_id=${encodeURIComponent(this.sessionId)}` : '';
+      const response = await fetch(`${this.baseUrl}/recording-status${query}`);
       const data = await response.json();
       return data;
     } catch (error) {